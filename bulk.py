@@ -0,0 +1,287 @@
+import time
+from collections import namedtuple
+from queue import Empty
+from queue import Full
+from queue import Queue
+from threading import Event
+from threading import Lock
+from threading import Thread
+
+from elasticsearch import TransportError
+from elasticsearch.helpers import parallel_bulk
+from elasticsearch.helpers import streaming_bulk
+
+from es_components.config import ELASTIC_SEARCH_HTTP_COMPRESS
+from es_components.config import ES_BULK_COMPRESSION_RATIO
+from es_components.config import ES_BULK_MAX_CHUNK_SIZE
+from es_components.config import ES_BULK_MAX_IN_FLIGHT
+from es_components.config import ES_BULK_MAX_WIRE_BYTES
+from es_components.config import ES_BULK_MAX_RETRIES
+from es_components.config import ES_BULK_MIN_CHUNK_SIZE
+from es_components.config import ES_BULK_QUEUE_SIZE
+from es_components.config import ES_BULK_TARGET_LATENCY
+from es_components.config import ES_BULK_THREAD_COUNT
+from es_components.config import ES_CHUNK_SIZE
+from es_components.config import ES_MAX_CHUNK_BYTES
+from es_components.exceptions import BulkEngineNotSupported
+
+BulkResult = namedtuple("BulkResult", ("success", "errors"))
+
+TOO_MANY_REQUESTS_STATUS = 429
+# seconds streaming threads wait for a queue before checking if the engine is stopped
+QUEUE_POLL_TIMEOUT = 0.1
+CIRCUIT_BREAKING_EXCEPTION = "circuit_breaking_exception"
+
+
+class BaseBulkEngine:
+    """
+    Executes bulk actions and collects per-item failures instead of raising on the first failed chunk.
+    chunk_size, max_chunk_bytes and the rest of params are passed to elasticsearch.helpers unchanged.
+    """
+    name = None
+
+    def execute(self, client, actions, **params):
+        success = 0
+        errors = []
+        params["raise_on_error"] = False
+
+        for is_ok, item in self._iter_results(client, actions, **params):
+            if is_ok:
+                success += 1
+            else:
+                errors.append(item)
+
+        return BulkResult(success, errors)
+
+    def _iter_results(self, client, actions, **params):
+        raise NotImplementedError
+
+
+class SerialBulkEngine(BaseBulkEngine):
+    """ Sends chunks one by one """
+    name = "serial"
+
+    def _iter_results(self, client, actions, **params):
+        yield from streaming_bulk(client, actions, **params)
+
+
+class ParallelBulkEngine(BaseBulkEngine):
+    """ Sends chunks from a pool of threads, at most queue_size chunks are waiting for a free thread """
+    name = "parallel"
+
+    def __init__(self, thread_count=ES_BULK_THREAD_COUNT, queue_size=ES_BULK_QUEUE_SIZE):
+        self.thread_count = thread_count
+        self.queue_size = queue_size
+
+    def _iter_results(self, client, actions, **params):
+        params.setdefault("thread_count", self.thread_count)
+        params.setdefault("queue_size", self.queue_size)
+        yield from parallel_bulk(client, actions, **params)
+
+
+class StreamingBulkEngine(BaseBulkEngine):
+    """
+    Streams actions to max_in_flight threads through a queue of at most queue_size chunks.
+    Every thread sends its chunks one by one and retries items rejected with 429 using exponential backoff,
+    so at most max_in_flight bulk requests are sent at a time and reading actions waits while the queue is full.
+    """
+    name = "streaming"
+    _done = object()
+
+    def __init__(self, max_in_flight=ES_BULK_MAX_IN_FLIGHT, queue_size=ES_BULK_QUEUE_SIZE,
+                 max_retries=ES_BULK_MAX_RETRIES):
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+
+    def _iter_results(self, client, actions, **params):
+        params.setdefault("max_retries", self.max_retries)
+        actions_queue = Queue(maxsize=self.queue_size * params.get("chunk_size", ES_CHUNK_SIZE))
+        results_queue = Queue()
+        stopped = Event()
+
+        def put_action(action):
+            """ Returns False if the engine is stopped before the action is queued """
+            while not stopped.is_set():
+                try:
+                    actions_queue.put(action, timeout=QUEUE_POLL_TIMEOUT)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def iter_actions():
+            while not stopped.is_set():
+                try:
+                    action = actions_queue.get(timeout=QUEUE_POLL_TIMEOUT)
+                except Empty:
+                    continue
+                if action is self._done:
+                    return
+                yield action
+
+        def read_actions():
+            actions_iterator = iter(actions)
+            try:
+                for action in actions_iterator:
+                    if not put_action(action):
+                        break
+            # pylint: disable=broad-except
+            except Exception as e:
+                # pylint: enable=broad-except
+                results_queue.put(e)
+            finally:
+                # stops generators of actions, e.g. upsert serialization, on errors
+                if hasattr(actions_iterator, "close"):
+                    actions_iterator.close()
+                for _ in range(self.max_in_flight):
+                    put_action(self._done)
+
+        def send_actions():
+            try:
+                for result in streaming_bulk(client, iter_actions(), **params):
+                    results_queue.put(result)
+            # pylint: disable=broad-except
+            except Exception as e:
+                # pylint: enable=broad-except
+                results_queue.put(e)
+            finally:
+                results_queue.put(self._done)
+
+        threads = [Thread(target=send_actions, daemon=True) for _ in range(self.max_in_flight)]
+        threads.append(Thread(target=read_actions, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        running = self.max_in_flight
+        try:
+            while running:
+                result = results_queue.get()
+                if result is self._done:
+                    running -= 1
+                elif isinstance(result, Exception):
+                    stopped.set()
+                    raise result
+                else:
+                    yield result
+        finally:
+            stopped.set()
+
+
+BULK_ENGINES = {
+    engine.name: engine
+    for engine in (SerialBulkEngine, ParallelBulkEngine, StreamingBulkEngine)
+}
+
+
+def get_bulk_engine(name):
+    try:
+        return BULK_ENGINES[name]()
+    except KeyError:
+        raise BulkEngineNotSupported(f"Unknown bulk engine: {name}")
+
+
+def get_max_chunk_bytes(http_compress=ELASTIC_SEARCH_HTTP_COMPRESS, max_wire_bytes=ES_BULK_MAX_WIRE_BYTES):
+    """ Max uncompressed bytes of a bulk request, ES_MAX_CHUNK_BYTES.
+
+    If requests are gzipped and max_wire_bytes is set, the limit is lowered to the estimated uncompressed size
+    of max_wire_bytes gzipped bytes, see ES_BULK_COMPRESSION_RATIO.
+    """
+    if not http_compress or not max_wire_bytes:
+        return ES_MAX_CHUNK_BYTES
+    return min(int(max_wire_bytes * ES_BULK_COMPRESSION_RATIO), ES_MAX_CHUNK_BYTES)
+
+
+def is_backpressure_error(error):
+    """ Check if ES rejected a request or an item because it is overloaded """
+    if isinstance(error, TransportError):
+        return error.status_code == TOO_MANY_REQUESTS_STATUS or CIRCUIT_BREAKING_EXCEPTION in str(error.info)
+
+    _, item = next(iter(error.items()))
+    return item.get("status") == TOO_MANY_REQUESTS_STATUS or CIRCUIT_BREAKING_EXCEPTION in str(item.get("error"))
+
+
+class AdaptiveChunkSize:
+    """
+    Bulk chunk size adapted at runtime.
+    The size grows while a bulk request takes less than target_latency seconds
+    and is halved when ES responds with 429 or circuit_breaking_exception.
+    """
+    GROW_FACTOR = 1.25
+
+    def __init__(self, chunk_size=ES_CHUNK_SIZE, min_chunk_size=ES_BULK_MIN_CHUNK_SIZE,
+                 max_chunk_size=ES_BULK_MAX_CHUNK_SIZE, target_latency=ES_BULK_TARGET_LATENCY):
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.target_latency = target_latency
+        self.chunk_size = min(max(chunk_size, min_chunk_size), max_chunk_size)
+        self._lock = Lock()
+
+    def shrink(self):
+        """ Halve the chunk size. Returns False if the size is already the minimal one. """
+        with self._lock:
+            if self.chunk_size <= self.min_chunk_size:
+                return False
+            self.chunk_size = max(self.chunk_size // 2, self.min_chunk_size)
+            return True
+
+    def record_latency(self, latency):
+        """ Grow the chunk size if a bulk request took less than target latency """
+        with self._lock:
+            if latency < self.target_latency:
+                self.chunk_size = min(int(self.chunk_size * self.GROW_FACTOR) + 1, self.max_chunk_size)
+
+    def execute(self, engine, client, actions, **params):
+        """ Execute actions with the engine using the current chunk size.
+
+        Rejected actions are retried with the halved chunk size until the minimal size is reached.
+        All actions are kept in memory to be able to retry them.
+        """
+        actions = list(actions)
+        success = 0
+        errors = []
+
+        while actions:
+            chunk_size = self.chunk_size
+            started_at = time.monotonic()
+            try:
+                result = engine.execute(client, actions, **{**params, "chunk_size": chunk_size})
+            except TransportError as error:
+                # the whole request was rejected, upsert actions are safe to repeat
+                if is_backpressure_error(error) and self.shrink():
+                    continue
+                raise
+
+            rejected = [error for error in result.errors if is_backpressure_error(error)]
+            success += result.success
+            errors += [error for error in result.errors if not is_backpressure_error(error)]
+
+            if rejected and self.shrink():
+                rejected_ids = {next(iter(error.values())).get("_id") for error in rejected}
+                actions = [action for action in actions if action.get("_id") in rejected_ids]
+                continue
+
+            errors += rejected
+            requests_count = -(-len(actions) // chunk_size)
+            self.record_latency((time.monotonic() - started_at) / requests_count)
+            actions = []
+
+        return BulkResult(success, errors)
+
+
+_adaptive_chunk_sizes = {}
+_adaptive_chunk_sizes_lock = Lock()
+
+
+def get_adaptive_chunk_size(name):
+    """ Get the process wide adaptive chunk size by name, e.g. by index name """
+    with _adaptive_chunk_sizes_lock:
+        if name not in _adaptive_chunk_sizes:
+            _adaptive_chunk_sizes[name] = AdaptiveChunkSize()
+        return _adaptive_chunk_sizes[name]
+
+
+def get_adaptive_chunk_sizes():
+    """ Current chunk size of every adaptive chunk size by name """
+    with _adaptive_chunk_sizes_lock:
+        return {name: adaptive.chunk_size for name, adaptive in _adaptive_chunk_sizes.items()}
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import RLock
+
+from es_components.config import ES_AGGREGATION_CACHE_SIZE
+from es_components.config import ES_AGGREGATION_CACHE_TTL
+from es_components.config import ES_DOCUMENT_CACHE_SIZE
+from es_components.config import ES_DOCUMENT_CACHE_TTL
+
+
+class LRUCache:
+    """
+    Thread safe size-bounded LRU cache with optional TTL in seconds.
+    Counts hits and misses of get() calls.
+    """
+
+    def __init__(self, max_size=1000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = RLock()
+
+    def _lookup(self, key):
+        """ Get a value without counting hits and misses. Returns None if the key is missing or expired. """
+        with self._lock:
+            try:
+                value, expires_at = self._items[key]
+            except KeyError:
+                return None
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def _count(self, is_hit):
+        with self._lock:
+            if is_hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        self._count(value is not None)
+        return default if value is None else value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def delete_many(self, predicate):
+        """ Delete all keys matching the predicate """
+        with self._lock:
+            for key in [key for key in self._items if predicate(key)]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, size=len(self._items), max_size=self.max_size)
+
+
+class DocumentCache(LRUCache):
+    """
+    Cache of raw ES documents keyed by namespace (index name) and id.
+    Every id keeps documents for each requested source separately, all of them are invalidated together.
+    """
+
+    def get_document(self, namespace, _id, source_key):
+        documents = self._lookup((namespace, _id))
+        document = documents.get(source_key) if documents else None
+        self._count(document is not None)
+        return document
+
+    def set_document(self, namespace, _id, source_key, document):
+        with self._lock:
+            documents = self._lookup((namespace, _id))
+            if documents is None:
+                self.set((namespace, _id), {source_key: document})
+            else:
+                # added in place to keep the expiry of the entry, so no source is cached longer than ttl
+                documents[source_key] = document
+
+    def invalidate(self, namespace, ids):
+        with self._lock:
+            for _id in ids:
+                self.delete((namespace, _id))
+
+    def invalidate_namespace(self, namespace):
+        self.delete_many(lambda key: key[0] == namespace)
+
+
+class LocalSharedCache:
+    """
+    Local stand-in for a shared cache such as memcached or redis.
+    Values are strings as serialized by the caller, the storage is shared by all instances of the process.
+    """
+    _storage = {}
+    _lock = RLock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value, expires_at = self._storage[key]
+            except KeyError:
+                return None
+            if expires_at is not None and expires_at <= time.time():
+                del self._storage[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._storage[key] = (value, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._storage.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._storage.clear()
+
+
+class AggregationCache:
+    """
+    Cache of aggregation results keyed by a canonical hash of the query.
+
+    Entries expire at the next multiple of ttl seconds of wall clock time,
+    so all processes drop results computed for the same time window together. ttl of 0 disables caching.
+    The backend is any object with get(key) and set(key, value, ttl) methods, e.g. LRUCache or LocalSharedCache.
+    """
+
+    def __init__(self, backend=None, ttl=ES_AGGREGATION_CACHE_TTL):
+        self.backend = backend if backend is not None else LRUCache(max_size=ES_AGGREGATION_CACHE_SIZE)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = RLock()
+
+    @staticmethod
+    def make_key(*parts):
+        """ Canonical hash of JSON serializable parts """
+        serialized = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+    def get_ttl(self):
+        """ Seconds left until the current TTL window ends """
+        if self.ttl <= 0:
+            return 0
+        return self.ttl - time.time() % self.ttl
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        # results are stored serialized so callers can not change them
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        self.backend.set(key, json.dumps(value), ttl=self.get_ttl())
+
+    def get_stats(self):
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses)
+
+
+_shared_document_cache = None
+
+
+def get_shared_document_cache():
+    """ Process wide document cache configured with ES_DOCUMENT_CACHE_SIZE and ES_DOCUMENT_CACHE_TTL """
+    # pylint: disable=global-statement
+    global _shared_document_cache
+    # pylint: enable=global-statement
+    if _shared_document_cache is None:
+        _shared_document_cache = DocumentCache(max_size=ES_DOCUMENT_CACHE_SIZE, ttl=ES_DOCUMENT_CACHE_TTL)
+    return _shared_document_cache
+
+
+def get_document_caches(document_cache=None):
+    """ Caches to invalidate on writes: the given one and the process wide cache if it was created """
+    caches = [document_cache] if document_cache is not None else []
+    if _shared_document_cache is not None and _shared_document_cache is not document_cache:
+        caches.append(_shared_document_cache)
+    return caches
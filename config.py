@@ -22,15 +22,63 @@ VIDEO_LANGUAGE_INDEX_PREFIX = "videolanguage_"
 VIDEO_LANGUAGE_DOC_TYPE = "videolanguage"
 
 ES_REQUEST_LIMIT = int(os.getenv("ES_REQUEST_LIMIT", "10000"))
+# Max count of concurrent requests issued by a manager for a single call. 1 means sequential requests
+ES_REQUEST_MAX_WORKERS = int(os.getenv("ES_REQUEST_MAX_WORKERS", "1"))
+ES_MSEARCH_BATCH_SIZE = int(os.getenv("ES_MSEARCH_BATCH_SIZE", "100"))
 # VIQ2-161: Trying to fix: circuit_breaking_exception; orig: "ES_CHUNK_SIZE", "500"
 ES_CHUNK_SIZE = int(os.getenv("ES_CHUNK_SIZE", "400"))
 ES_BULK_REFRESH_OPTION = os.getenv("ES_BULK_REFRESH_OPTION", "wait_for")
 
+# Max uncompressed bytes of a bulk request body, see es_components.bulk.get_max_chunk_bytes
 ES_MAX_CHUNK_BYTES = int(os.getenv("ES_MAX_CHUNK_BYTES", "10485760"))
+# Optional budget of gzipped bulk bytes sent over network, 0 disables it. Compressed sizes are not measured,
+# the budget is an estimate converted to uncompressed bytes with ES_BULK_COMPRESSION_RATIO
+ES_BULK_MAX_WIRE_BYTES = int(os.getenv("ES_BULK_MAX_WIRE_BYTES", "0"))
+# Expected ratio of a bulk body size to its gzipped size
+ES_BULK_COMPRESSION_RATIO = float(os.getenv("ES_BULK_COMPRESSION_RATIO", "4"))
+# Bulk engine used by managers upsert: "serial", "parallel" or "streaming"
+ES_BULK_ENGINE = os.getenv("ES_BULK_ENGINE", "serial")
+ES_BULK_THREAD_COUNT = int(os.getenv("ES_BULK_THREAD_COUNT", "4"))
+ES_BULK_QUEUE_SIZE = int(os.getenv("ES_BULK_QUEUE_SIZE", "4"))
+ES_BULK_MAX_RETRIES = int(os.getenv("ES_BULK_MAX_RETRIES", "3"))
+# Max count of concurrent bulk requests of the "streaming" engine
+ES_BULK_MAX_IN_FLIGHT = int(os.getenv("ES_BULK_MAX_IN_FLIGHT", "2"))
+# Adapt bulk chunk size at runtime starting from ES_CHUNK_SIZE, see es_components.bulk.AdaptiveChunkSize
+ES_BULK_ADAPTIVE_CHUNK_SIZE = os.getenv("ES_BULK_ADAPTIVE_CHUNK_SIZE", "0") == "1"
+ES_BULK_MIN_CHUNK_SIZE = int(os.getenv("ES_BULK_MIN_CHUNK_SIZE", "25"))
+ES_BULK_MAX_CHUNK_SIZE = int(os.getenv("ES_BULK_MAX_CHUNK_SIZE", "2000"))
+ES_BULK_TARGET_LATENCY = float(os.getenv("ES_BULK_TARGET_LATENCY", "1.0"))
+
+# Process wide document cache, see es_components.cache.get_shared_document_cache
+ES_DOCUMENT_CACHE_SIZE = int(os.getenv("ES_DOCUMENT_CACHE_SIZE", "10000"))
+ES_DOCUMENT_CACHE_TTL = int(os.getenv("ES_DOCUMENT_CACHE_TTL", "60"))
+# Aggregation results cache, see es_components.cache.AggregationCache.
+# ES_AGGREGATION_CACHE_TTL bounds staleness of cached results in seconds, 0 disables caching
+ES_AGGREGATION_CACHE_SIZE = int(os.getenv("ES_AGGREGATION_CACHE_SIZE", "1000"))
+ES_AGGREGATION_CACHE_TTL = int(os.getenv("ES_AGGREGATION_CACHE_TTL", "60"))
+
+# Collect metrics of manager operations, see es_components.metrics
+ES_METRICS_ENABLED = os.getenv("ES_METRICS_ENABLED", "1") == "1"
+# Record requests slower than ES_SLOW_QUERY_THRESHOLD seconds by query fingerprint, see es_components.slow_query_log
+ES_SLOW_QUERY_LOG_ENABLED = os.getenv("ES_SLOW_QUERY_LOG_ENABLED", "0") == "1"
+ES_SLOW_QUERY_THRESHOLD = float(os.getenv("ES_SLOW_QUERY_THRESHOLD", "1.0"))
+# Count of the slowest query fingerprints kept in memory
+ES_SLOW_QUERY_LOG_SIZE = int(os.getenv("ES_SLOW_QUERY_LOG_SIZE", "100"))
 
 ELASTIC_SEARCH_URLS = os.getenv("ELASTIC_SEARCH_URLS", "").split(",")
 ELASTIC_SEARCH_TIMEOUT = int(os.getenv("ELASTIC_SEARCH_TIMEOUT", "300"))
 ELASTIC_SEARCH_USE_SSL = os.getenv("ELASTIC_SEARCH_USE_SSL", "1") == "1"
+# Max count of kept alive connections per ES node
+ELASTIC_SEARCH_MAXSIZE = int(os.getenv("ELASTIC_SEARCH_MAXSIZE", "10"))
+ELASTIC_SEARCH_KEEP_ALIVE = os.getenv("ELASTIC_SEARCH_KEEP_ALIVE", "1") == "1"
+# Gzip request bodies and accept gzip responses
+ELASTIC_SEARCH_HTTP_COMPRESS = os.getenv("ELASTIC_SEARCH_HTTP_COMPRESS", "0") == "1"
+# Gzip level of request bodies, 1 is the fastest one and still shrinks JSON several times
+ELASTIC_SEARCH_COMPRESS_LEVEL = int(os.getenv("ELASTIC_SEARCH_COMPRESS_LEVEL", "1"))
+ELASTIC_SEARCH_SNIFF = os.getenv("ELASTIC_SEARCH_SNIFF", "0") == "1"
+ELASTIC_SEARCH_SNIFFER_TIMEOUT = int(os.getenv("ELASTIC_SEARCH_SNIFFER_TIMEOUT", "60"))
+ELASTIC_SEARCH_RETRY_ON_TIMEOUT = os.getenv("ELASTIC_SEARCH_RETRY_ON_TIMEOUT", "0") == "1"
+ELASTIC_SEARCH_MAX_RETRIES = int(os.getenv("ELASTIC_SEARCH_MAX_RETRIES", "3"))
 
 AWS_ES_ACCESS_KEY_ID = os.getenv("AWS_ES_ACCESS_KEY_ID", "")
 AWS_ES_SECRET_ACCESS_KEY = os.getenv("AWS_ES_SECRET_ACCESS_KEY", "")
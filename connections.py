@@ -1,16 +1,64 @@
+import gzip
+import os
+
 import certifi
 
 from elasticsearch_dsl import connections
 
 from elasticsearch import RequestsHttpConnection
+from elasticsearch import Urllib3HttpConnection
+from requests.adapters import HTTPAdapter
 from requests_aws4auth import AWS4Auth
+from urllib3.exceptions import LocationValueError
 
 from es_components.config import ELASTIC_SEARCH_URLS
 from es_components.config import ELASTIC_SEARCH_TIMEOUT
 from es_components.config import ELASTIC_SEARCH_USE_SSL
+from es_components.config import ELASTIC_SEARCH_COMPRESS_LEVEL
+from es_components.config import ELASTIC_SEARCH_HTTP_COMPRESS
+from es_components.config import ELASTIC_SEARCH_KEEP_ALIVE
+from es_components.config import ELASTIC_SEARCH_MAX_RETRIES
+from es_components.config import ELASTIC_SEARCH_MAXSIZE
+from es_components.config import ELASTIC_SEARCH_RETRY_ON_TIMEOUT
+from es_components.config import ELASTIC_SEARCH_SNIFF
+from es_components.config import ELASTIC_SEARCH_SNIFFER_TIMEOUT
 
 from es_components.config import AWS_ES_ACCESS_KEY_ID
 from es_components.config import AWS_ES_SECRET_ACCESS_KEY
+from es_components.exceptions import AsyncConnectionNotSupported
+from es_components.tracing import TracingTransport
+
+try:
+    from elasticsearch import AsyncElasticsearch
+except ImportError:
+    # async client requires aiohttp
+    AsyncElasticsearch = None
+
+_async_es_connection = None
+# pid of the process the default connection was checked in
+_es_connection_pid = None
+
+
+class CompressLevelMixin:
+    """ Gzip request bodies with ELASTIC_SEARCH_COMPRESS_LEVEL instead of the slowest level 9 """
+    compress_level = ELASTIC_SEARCH_COMPRESS_LEVEL
+
+    def _gzip_compress(self, body):
+        return gzip.compress(body, compresslevel=self.compress_level)
+
+
+class CompressedUrllib3HttpConnection(CompressLevelMixin, Urllib3HttpConnection):
+    pass
+
+
+class PooledRequestsHttpConnection(CompressLevelMixin, RequestsHttpConnection):
+    """ RequestsHttpConnection keeping up to maxsize connections to the node alive, like the default connection """
+
+    def __init__(self, *args, maxsize=ELASTIC_SEARCH_MAXSIZE, **kwargs):
+        super().__init__(*args, **kwargs)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
 
 def get_es_connection_configurations():
@@ -18,14 +66,99 @@ def get_es_connection_configurations():
         "hosts": ELASTIC_SEARCH_URLS,
         "timeout": ELASTIC_SEARCH_TIMEOUT,
         "use_ssl": ELASTIC_SEARCH_USE_SSL,
-        "ca_certs": certifi.where()
+        "ca_certs": certifi.where(),
+        "maxsize": ELASTIC_SEARCH_MAXSIZE,
+        "http_compress": ELASTIC_SEARCH_HTTP_COMPRESS,
+        "retry_on_timeout": ELASTIC_SEARCH_RETRY_ON_TIMEOUT,
+        "max_retries": ELASTIC_SEARCH_MAX_RETRIES,
+        "transport_class": TracingTransport,
     }
+    if not ELASTIC_SEARCH_KEEP_ALIVE:
+        es_connection_config["headers"] = {"connection": "close"}
+    if ELASTIC_SEARCH_SNIFF:
+        es_connection_config.update(
+            sniff_on_start=True,
+            sniff_on_connection_fail=True,
+            sniffer_timeout=ELASTIC_SEARCH_SNIFFER_TIMEOUT,
+        )
     if AWS_ES_ACCESS_KEY_ID and AWS_ES_SECRET_ACCESS_KEY:
         es_connection_config["http_auth"] = AWS4Auth(AWS_ES_ACCESS_KEY_ID, AWS_ES_SECRET_ACCESS_KEY, "us-east-1", "es")
-        es_connection_config["connection_class"] = RequestsHttpConnection
+        es_connection_config["connection_class"] = PooledRequestsHttpConnection
+    elif ELASTIC_SEARCH_HTTP_COMPRESS:
+        es_connection_config["connection_class"] = CompressedUrllib3HttpConnection
     return es_connection_config
 
 
 def init_es_connection():
+    # pylint: disable=global-statement
+    global _es_connection_pid
+    # pylint: enable=global-statement
     es_connection_config = get_es_connection_configurations()
     connections.configure(default=es_connection_config)
+    _es_connection_pid = os.getpid()
+
+
+def ensure_es_connection():
+    """ Configure the default connection if it is not configured yet in the current process """
+    # pylint: disable=global-statement
+    global _es_connection_pid
+    # pylint: enable=global-statement
+    if _es_connection_pid == os.getpid():
+        return
+    if _es_connection_pid is not None:
+        # forked without os.register_at_fork() support
+        reset_es_connections()
+    try:
+        connections.get_connection()
+    except (KeyError, LocationValueError):
+        init_es_connection()
+    _es_connection_pid = os.getpid()
+
+
+def reset_es_connections():
+    """ Drop clients created in the parent process, they are re-created from their configuration on demand.
+    Called in a forked child process, so workers don't share sockets of the parent process
+    """
+    # pylint: disable=global-statement
+    global _async_es_connection
+    global _es_connection_pid
+    # pylint: enable=global-statement
+    # pylint: disable=protected-access
+    registry = connections.connections
+    for alias in list(registry._conns):
+        if alias in registry._kwargs:
+            del registry._conns[alias]
+    # pylint: enable=protected-access
+    _async_es_connection = None
+    _es_connection_pid = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_es_connections)
+
+
+def get_async_es_connection():
+    """ Process wide AsyncElasticsearch client configured like the default connection.
+    It has to be used within one event loop and closed with close_async_es_connection()
+    """
+    # pylint: disable=global-statement
+    global _async_es_connection
+    # pylint: enable=global-statement
+    if _async_es_connection is None:
+        if AsyncElasticsearch is None:
+            raise AsyncConnectionNotSupported("aiohttp is required for async managers")
+        es_connection_config = get_es_connection_configurations()
+        es_connection_config.pop("transport_class", None)
+        if es_connection_config.pop("connection_class", None) is PooledRequestsHttpConnection:
+            raise AsyncConnectionNotSupported("AWS signed requests are not supported by async connections")
+        _async_es_connection = AsyncElasticsearch(**es_connection_config)
+    return _async_es_connection
+
+
+async def close_async_es_connection():
+    # pylint: disable=global-statement
+    global _async_es_connection
+    # pylint: enable=global-statement
+    if _async_es_connection is not None:
+        await _async_es_connection.close()
+        _async_es_connection = None
@@ -4,3 +4,19 @@ class DataModelNotSpecified(Exception):
 
 class SectionsNotAllowed(Exception):
     pass
+
+
+class BulkEngineNotSupported(Exception):
+    pass
+
+
+class AsyncConnectionNotSupported(Exception):
+    pass
+
+
+class MultiSearchItemError(Exception):
+    """ A search of a multi search request failed """
+    def __init__(self, search, error):
+        super().__init__(error.get("type"), error)
+        self.search = search
+        self.error = error
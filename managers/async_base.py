@@ -0,0 +1,153 @@
+import asyncio
+
+from elasticsearch.helpers import BulkIndexError
+from elasticsearch_dsl.response import Response
+from elasticsearch_dsl.response import UpdateByQueryResponse
+
+from es_components.bulk import get_max_chunk_bytes
+from es_components.config import ES_BULK_REFRESH_OPTION
+from es_components.config import ES_CHUNK_SIZE
+from es_components.config import ES_REQUEST_LIMIT
+from es_components.connections import get_async_es_connection
+from es_components.managers.channel import ChannelManager
+from es_components.managers.video import VideoManager
+from es_components.utils import chunks
+
+try:
+    from elasticsearch.helpers import async_scan
+    from elasticsearch.helpers import async_streaming_bulk
+except ImportError:
+    # async helpers require aiohttp, get_async_es_connection() reports it
+    async_scan = async_streaming_bulk = None
+
+
+class AsyncManagerMixin:
+    """
+    Async counterparts of BaseManager methods executed with AsyncElasticsearch.
+    Searches, upsert actions and aggregations are built by the synchronous manager methods,
+    only requests are sent asynchronously. Mix it before a manager class:
+
+        class AsyncChannelManager(AsyncManagerMixin, ChannelManager):
+            pass
+    """
+
+    @staticmethod
+    def _get_async_client():
+        return get_async_es_connection()
+
+    # pylint: disable=too-many-arguments
+    async def aget(self, ids, skip_none=False, source=None, chunk_size=None, fields=None):
+        """ Async get(), all mget requests are sent concurrently. The document cache is not used """
+        source = self.get_source(fields, source)
+        client = self._get_async_client()
+        responses = await asyncio.gather(*[
+            client.mget(body={"ids": list(_ids)}, index=self._get_index_name(), **self._get_source_params(source))
+            for _ids in chunks(ids, chunk_size or ES_REQUEST_LIMIT)
+        ])
+        entities = [
+            self.model.from_es(doc) if doc.get("found") else None
+            for response in responses
+            for doc in response["docs"]
+        ]
+
+        if skip_none and None in entities:
+            entities = [entity for entity in entities if entity is not None]
+
+        return entities
+
+    # pylint: enable=too-many-arguments
+
+    async def asearch(self, search=None, **kwargs):
+        """ Execute the search or the search built by search(**kwargs)
+
+        :return: elasticsearch_dsl Response
+        """
+        if search is None:
+            search = self.search(**kwargs)
+        # pylint: disable=protected-access
+        result = await self._get_async_client().search(
+            index=self._get_index_name(), body=search.to_dict(), **search._params
+        )
+        # pylint: enable=protected-access
+        return Response(search, result)
+
+    async def ascan(self, filters=None, fields=None, search=None):
+        """ Async scan(), yields model objects """
+        if search is None:
+            search = self.search(filters=filters, fields=fields)
+        hits = async_scan(self._get_async_client(), query=search.to_dict(), index=self._get_index_name())
+        async for hit in hits:
+            yield self.model.from_es(hit)
+
+    async def aupsert(self, entries, ignore_update_time_sections=None, lean=False, **kwargs):
+        """ Async upsert() with streaming bulk requests, see upsert() for params """
+        ignore_update_time_sections = set(ignore_update_time_sections or {})
+        raise_on_error = kwargs.pop("raise_on_error", True)
+        client = self._get_async_client()
+        errors = []
+
+        for _entries in chunks(entries, ES_REQUEST_LIMIT):
+            _entries = list(_entries)
+            params = dict(
+                chunk_size=ES_CHUNK_SIZE,
+                refresh="false" if self._batch_session_depth else ES_BULK_REFRESH_OPTION,
+                max_chunk_bytes=get_max_chunk_bytes(),
+            )
+            params.update(kwargs)
+            params["raise_on_error"] = False
+            actions = self._upsert_generator(_entries, ignore_update_time_sections, lean=lean)
+            async for is_ok, item in async_streaming_bulk(client, actions, **params):
+                if not is_ok:
+                    errors.append(item)
+            self._invalidate_document_cache([self._get_entry_id(entry) for entry in _entries])
+
+        if errors and raise_on_error:
+            raise BulkIndexError(f"{len(errors)} document(s) failed to index.", errors)
+
+        return errors
+
+    async def adelete(self, ids, conflicts="abort"):
+        """ Async delete() """
+        client = self._get_async_client()
+        for _ids in chunks(ids, ES_REQUEST_LIMIT):
+            _ids = list(_ids)
+            search = self.model.search().query("ids", values=_ids)
+            await client.delete_by_query(index=self._get_index_name(), body=search.to_dict(), conflicts=conflicts)
+            self._invalidate_document_cache(_ids)
+
+    async def aget_aggregation(self, search=None, size=0, properties=None):
+        """ Async get_aggregation(), shares aggregation_cache with it """
+        if not properties:
+            return None
+
+        key = None
+        if self.aggregation_cache is not None:
+            key = self._get_aggregation_cache_key(search, size, properties)
+            aggregations_result = self.aggregation_cache.get(key)
+            if aggregations_result is not None:
+                return aggregations_result
+
+        response = await self.asearch(self._build_aggregation_search(search, size, properties))
+        aggregations_result = self._adapt_aggregation_result(response.aggregations.to_dict())
+
+        if key is not None:
+            self.aggregation_cache.set(key, aggregations_result)
+        return aggregations_result
+
+    async def aupdate_by_query(self, update):
+        """ Execute update by query built with update(), e.g. self.update(filter_query).script(...) """
+        # pylint: disable=protected-access
+        result = await self._get_async_client().update_by_query(
+            index=self._get_index_name(), body=update.to_dict(), **update._params
+        )
+        # pylint: enable=protected-access
+        self._invalidate_document_cache()
+        return UpdateByQueryResponse(update, result)
+
+
+class AsyncChannelManager(AsyncManagerMixin, ChannelManager):
+    pass
+
+
+class AsyncVideoManager(AsyncManagerMixin, VideoManager):
+    pass
@@ -1,21 +1,37 @@
+import copy
+import json
 import os
 import re
 import statistics
 from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
 from functools import reduce
 from typing import Type
 
 from elasticsearch import NotFoundError
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import BulkIndexError
+from elasticsearch.helpers import scan
 from elasticsearch_dsl import MultiSearch
 from elasticsearch_dsl import connections
-from urllib3.exceptions import LocationValueError
-
+from elasticsearch_dsl.response import Response
+
+from es_components.bulk import get_adaptive_chunk_size
+from es_components.bulk import get_bulk_engine
+from es_components.bulk import get_max_chunk_bytes
+from es_components.cache import AggregationCache
+from es_components.cache import DocumentCache
+from es_components.cache import get_document_caches
+from es_components.config import ES_BULK_ADAPTIVE_CHUNK_SIZE
+from es_components.config import ES_BULK_ENGINE
 from es_components.config import ES_BULK_REFRESH_OPTION
 from es_components.config import ES_CHUNK_SIZE
-from es_components.config import ES_MAX_CHUNK_BYTES
+from es_components.config import ES_MSEARCH_BATCH_SIZE
 from es_components.config import ES_REQUEST_LIMIT
-from es_components.connections import init_es_connection
+from es_components.config import ES_REQUEST_MAX_WORKERS
+from es_components.config import ES_SLOW_QUERY_LOG_ENABLED
+from es_components.connections import ensure_es_connection
 from es_components.constants import EsDictFields
 from es_components.constants import FORCED_FILTER_OUDATED_DAYS
 from es_components.constants import MAIN_ID_FIELD
@@ -26,19 +42,36 @@ from es_components.constants import TimestampFields
 from es_components.countries import COUNTRIES
 from es_components.datetime_service import datetime_service
 from es_components.exceptions import DataModelNotSpecified
+from es_components.exceptions import MultiSearchItemError
 from es_components.exceptions import SectionsNotAllowed
 from es_components.iab_categories import HIDDEN_IAB_CATEGORIES
+from es_components.metrics import count_documents
+from es_components.metrics import instrument
 from es_components.models.base import BaseDocument
 from es_components.monitor import Monitor
 from es_components.monitor import Warnings
 from es_components.query_builder import QueryBuilder
 from es_components.query_repository import get_ias_verified_exists_filter
 from es_components.query_repository import get_last_vetted_at_exists_filter
+from es_components.slow_query_log import enable_slow_query_log
+from es_components.tracing import span
+from es_components.tracing import timed_iter
 from es_components.utils import chunks
+from es_components.utils import concurrent_map
+from es_components.utils import merge_iterators
 from es_components.utils import retry_on_conflict
 
 AGGREGATION_COUNT_SIZE = 100000
 AGGREGATION_PERCENTS = tuple(range(10, 100, 10))
+SEARCH_AFTER_PAGE_SIZE = 1000
+IDS_SCAN_PAGE_SIZE = 10000
+COUNT_EXISTS_AGGREGATION = "count_exists"
+POINT_IN_TIME_KEEP_ALIVE = "5m"
+PERCENTILES_TDIGEST = "tdigest"
+PERCENTILES_HDR = "hdr"
+
+if ES_SLOW_QUERY_LOG_ENABLED:
+    enable_slow_query_log()
 
 
 # pylint: disable=too-many-public-methods
@@ -46,6 +79,8 @@ class BaseManager:
     """
     allowed_sections - a tuple of allowed sections name
     model - class of ES data model
+    document_cache - optional read-through cache of get(), may be shared by managers
+    aggregation_cache - optional cache of get_aggregation() results, may be shared by managers
     """
     allowed_sections = (Sections.MAIN, Sections.DELETED, Sections.SEGMENTS)
     model: Type[BaseDocument] = None
@@ -56,12 +91,20 @@ class BaseManager:
     percentiles_aggregation_fields = ()
     count_exists_aggregation_fields = ()
     count_missing_aggregation_fields = ()
+    document_cache: DocumentCache = None
+    aggregation_cache: AggregationCache = None
+
+    # model class -> {section name: frozenset of field names}
+    _sections_fields_cache = {}
 
-    def __init__(self, sections=None, upsert_sections=None, context: dict = None):
+    def __init__(self, sections=None, upsert_sections=None, context: dict = None,
+                 document_cache: DocumentCache = None, aggregation_cache: AggregationCache = None):
         """ Initialize manager.
 
         :param sections: tuple of sections name. If sections is not specified,
         manager will work only with MAIN section.
+        :param document_cache: cache of get() results. Own upserts, deletes and updates invalidate it
+        :param aggregation_cache: cache of get_aggregation() results, entries are not invalidated by writes
 
         The first section in the *sections* list is the control section.
         The control section is used to search. For example, in .get_outdated() method.
@@ -72,12 +115,15 @@ class BaseManager:
         self.sections = self._init_sections(sections)
         self.upsert_sections = self._init_sections(upsert_sections or sections)
 
-        try:
-            connections.connections.get_connection()
-        except (KeyError, LocationValueError):
-            init_es_connection()
+        ensure_es_connection()
 
         self.context = context or dict()
+        self._batch_session_depth = 0
+
+        if document_cache is not None:
+            self.document_cache = document_cache
+        if aggregation_cache is not None:
+            self.aggregation_cache = aggregation_cache
 
     def _init_sections(self, sections):
         if sections is None:
@@ -94,25 +140,140 @@ class BaseManager:
 
         return sections
 
-    def get(self, ids, skip_none=False, source=None):
+    # pylint: disable=too-many-arguments
+    @instrument("get", documents=len)
+    def get(self, ids, skip_none=False, source=None, max_workers=None, chunk_size=None, fields=None):
         """ Retrieve model entities.
 
         :param ids: a list of ids
         :param skip_none: determine if None value should be skipped
         :param source: list of fields to source
-        :return: list of entities
+        :param max_workers: max count of concurrent mget requests, ES_REQUEST_MAX_WORKERS by default.
+        Chunks are requested sequentially if it is 1
+        :param chunk_size: count of ids per mget request, ES_REQUEST_LIMIT by default
+        :param fields: source filter overriding source, see get_source()
+        :return: list of entities in the order of ids
         """
+        ids_chunks = [list(_ids) for _ids in chunks(ids, chunk_size or ES_REQUEST_LIMIT)]
+        mget = partial(self._mget, source=self.get_source(fields, source))
 
         entities = []
 
-        for _ids in chunks(ids, ES_REQUEST_LIMIT):
-            entities += self.model.mget(list(_ids), _source=source or self.sections)
+        for _entities in concurrent_map(mget, ids_chunks, max_workers or ES_REQUEST_MAX_WORKERS):
+            entities += _entities
 
         if skip_none and None in entities:
             entities = [entity for entity in entities if entity is not None]
 
         return entities
 
+    # pylint: enable=too-many-arguments
+
+    # pylint: disable=too-many-arguments
+    @instrument("iter_get")
+    def iter_get(self, ids, skip_none=False, source=None, chunk_size=None, raw=False, fields=None):
+        """ Retrieve model entities chunk by chunk.
+
+        Only one chunk of entities is kept in memory at a time.
+
+        :param ids: an iterable of ids
+        :param skip_none: determine if None value should be skipped
+        :param source: list of fields to source
+        :param chunk_size: count of ids per mget request, ES_REQUEST_LIMIT by default
+        :param raw: yield _source dicts instead of model objects
+        :param fields: source filter overriding source, see get_source()
+        :return: generator of entities in the order of ids
+        """
+        mget = self._mget_source if raw else self._mget
+        source = self.get_source(fields, source)
+
+        for _ids in chunks(ids, chunk_size or ES_REQUEST_LIMIT):
+            for entity in mget(list(_ids), source=source):
+                if skip_none and entity is None:
+                    continue
+                yield entity
+
+    # pylint: enable=too-many-arguments
+
+    def get_source(self, fields=None, source=None):
+        """ Build _source filter.
+
+        :param fields: a list of dotted field paths to include,
+        or a dict with "includes" and "excludes" lists of field paths, wildcards are allowed.
+        For example, {"includes": ["general_data.title", "stats"], "excludes": ["stats.*_history"]}.
+        Manager sections are included if includes are not specified
+        :param source: list of fields to source, used if fields are not specified
+        :return: a list of fields or a dict with includes and excludes
+        """
+        fields = fields or source or self.sections
+        if isinstance(fields, dict):
+            return dict(
+                includes=list(fields.get("includes") or self.sections),
+                excludes=list(fields.get("excludes") or ()),
+            )
+        return fields
+
+    @staticmethod
+    def _get_source_params(source):
+        """ Convert _source filter to get/mget API params """
+        if isinstance(source, dict):
+            params = dict(_source_includes=source["includes"])
+            if source["excludes"]:
+                params["_source_excludes"] = source["excludes"]
+            return params
+        return dict(_source=source)
+
+    def _mget(self, ids, source=None):
+        source = source or self.sections
+        if self.document_cache is None:
+            return self.model.mget(ids, **self._get_source_params(source))
+        return [self.model.from_es(hit) if hit else None for hit in self._mget_cached_hits(ids, source)]
+
+    def _mget_cached_hits(self, ids, source=None):
+        """ Get raw hits from the document cache, missed ones are requested by one mget request """
+        namespace = self._get_index_name()
+        source = source or self.sections
+        source_key = json.dumps(source if isinstance(source, dict) else sorted(source), sort_keys=True)
+        hits = {_id: self.document_cache.get_document(namespace, _id, source_key) for _id in ids}
+
+        missed_ids = [_id for _id, hit in hits.items() if hit is None]
+        if missed_ids:
+            result = connections.get_connection().mget(
+                body={"ids": missed_ids},
+                index=namespace,
+                **self._get_source_params(source),
+            )
+            for hit in result["docs"]:
+                if hit.get("found"):
+                    self.document_cache.set_document(namespace, hit["_id"], source_key, hit)
+                    hits[hit["_id"]] = hit
+
+        # returned documents may be changed by callers
+        return [copy.deepcopy(hits[_id]) if hits[_id] else None for _id in ids]
+
+    def _get_index_name(self):
+        # pylint: disable=protected-access
+        return self.model._index._name
+        # pylint: enable=protected-access
+
+    def _invalidate_document_cache(self, ids=None):
+        """ Invalidate cached documents by ids, all documents of the model are invalidated if ids is None.
+        The process wide cache is invalidated too, it may be used by other managers reading the same index
+        """
+        for document_cache in get_document_caches(self.document_cache):
+            if ids is None:
+                document_cache.invalidate_namespace(self._get_index_name())
+            else:
+                document_cache.invalidate(self._get_index_name(), ids)
+
+    def _mget_source(self, ids, source=None):
+        result = connections.get_connection().mget(
+            body={"ids": ids},
+            index=self._get_index_name(),
+            **self._get_source_params(source or self.sections),
+        )
+        return [doc.get(EsDictFields.SOURCE) if doc.get("found") else None for doc in result["docs"]]
+
     def get_or_create(self, ids, only_new=False):
         """ Retrieve or create(if is not exists) model entities.
 
@@ -146,14 +307,20 @@ class BaseManager:
         except NotFoundError:
             pass
         # pylint: enable=protected-access
+        self.invalidate_section_fields_cache()
+        self._invalidate_document_cache()
         self.model.init()
 
+    @instrument("truncate")
     def truncate(self, refresh=False):
-        return self._search().query("match_all").params(
+        result = self._search().query("match_all").params(
             conflicts="proceed",
             refresh=refresh,
         ).delete()
+        self._invalidate_document_cache()
+        return result
 
+    @instrument("delete")
     def delete(self, ids, conflicts="abort"):
         """ Delete entities.
 
@@ -162,35 +329,138 @@ class BaseManager:
         """
 
         for _ids in chunks(ids, ES_REQUEST_LIMIT):
-            self.model.search().query("ids", values=list(_ids)).params(
+            _ids = list(_ids)
+            self.model.search().query("ids", values=_ids).params(
                 conflicts=conflicts
             ).delete()
+            self._invalidate_document_cache(_ids)
+            count_documents(self, "delete", len(_ids))
 
-    def upsert(self, entries, ignore_update_time_sections=None, **kwargs):
+    # pylint: disable=too-many-arguments
+    @instrument("upsert")
+    def upsert(self, entries, ignore_update_time_sections=None, lean=False, engine=None, **kwargs):
         """ Upsert a list of entries.
 
         :param entries: a list of model objects
         :param ignore_update_time_sections: Iterable of section names to not update updated_at timestamp
+        :param lean: serialize only upsert sections of the entries instead of the whole documents
+        :param engine: bulk engine name, ES_BULK_ENGINE by default
+        :param raise_on_error: raise BulkIndexError with all failed items after all entries are processed
+        :param chunk_size: bulk chunk size. If it is not specified and ES_BULK_ADAPTIVE_CHUNK_SIZE is enabled,
+        chunk size is adapted at runtime, see get_bulk_chunk_size()
+        :return: a list of failed items
         """
         ignore_update_time_sections = set(ignore_update_time_sections or {})
+        bulk_engine = get_bulk_engine(engine or ES_BULK_ENGINE)
+        raise_on_error = kwargs.pop("raise_on_error", True)
+        adaptive_chunk_size = self._get_adaptive_chunk_size() \
+            if ES_BULK_ADAPTIVE_CHUNK_SIZE and "chunk_size" not in kwargs else None
+        errors = []
+
         for _entries in chunks(entries, ES_REQUEST_LIMIT):
+            _entries = list(_entries)
             params = dict(
                 chunk_size=ES_CHUNK_SIZE,
-                refresh=ES_BULK_REFRESH_OPTION,
-                max_chunk_bytes=ES_MAX_CHUNK_BYTES,
+                refresh="false" if self._batch_session_depth else ES_BULK_REFRESH_OPTION,
+                max_chunk_bytes=get_max_chunk_bytes(),
             )
             params.update(kwargs)
-            bulk(
-                connections.get_connection(),
-                self._upsert_generator(_entries, ignore_update_time_sections),
-                **params,
-            )
+            with span("manager.upsert", manager=self.__class__.__name__, index=self._get_index_name(),
+                      documents=len(_entries)) as upsert_span:
+                # time spent in _upsert_generator is attributed to the span, requests add their own spans
+                actions = timed_iter(
+                    self._upsert_generator(_entries, ignore_update_time_sections, lean=lean),
+                    upsert_span, "serialization_time"
+                )
+                if adaptive_chunk_size:
+                    result = adaptive_chunk_size.execute(bulk_engine, connections.get_connection(), actions, **params)
+                else:
+                    result = bulk_engine.execute(connections.get_connection(), actions, **params)
+            errors += result.errors
+            count_documents(self, "upsert", len(_entries))
+            self._invalidate_document_cache([self._get_entry_id(entry) for entry in _entries])
+
+        if errors and raise_on_error:
+            raise BulkIndexError(f"{len(errors)} document(s) failed to index.", errors)
+
+        return errors
+
+    # pylint: enable=too-many-arguments
+
+    @staticmethod
+    def _get_entry_id(entry):
+        """ Id of an upsert entry, a model object or a dict with _id key """
+        return entry["_id"] if isinstance(entry, dict) else entry.meta.id
 
-    def _search(self):
-        return self.model.search().source(self.sections)
+    @contextmanager
+    def batch_session(self, refresh_interval=None):
+        """ Defer index refresh for upserts made inside the context.
 
-    def search(self, query=None, filters=None, sort=None, limit=10000, offset=None):
-        search = self._search()
+        Upserts of the manager don't wait for a refresh, a single index refresh is issued on exit.
+
+        :param refresh_interval: index refresh_interval to set during the session, e.g. "-1" or "30s".
+        The original value is restored on exit
+        """
+        # pylint: disable=protected-access
+        index = self.model._index
+        # pylint: enable=protected-access
+        original_refresh_interval = None
+        if refresh_interval is not None:
+            original_refresh_interval = self._get_refresh_interval()
+            index.put_settings(body={"index": {"refresh_interval": refresh_interval}})
+
+        self._batch_session_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_session_depth -= 1
+            if refresh_interval is not None:
+                # None resets refresh_interval to the default value
+                index.put_settings(body={"index": {"refresh_interval": original_refresh_interval}})
+            if not self._batch_session_depth:
+                index.refresh()
+
+    def _get_refresh_interval(self):
+        # pylint: disable=protected-access
+        settings = self.model._index.get_settings()
+        # pylint: enable=protected-access
+        for _, index_settings in settings.items():
+            return index_settings["settings"]["index"].get("refresh_interval")
+        return None
+
+    def _get_adaptive_chunk_size(self):
+        return get_adaptive_chunk_size(self._get_index_name())
+
+    def get_bulk_chunk_size(self):
+        """ Bulk chunk size currently used by upsert """
+        if ES_BULK_ADAPTIVE_CHUNK_SIZE:
+            return self._get_adaptive_chunk_size().chunk_size
+        return ES_CHUNK_SIZE
+
+    def upsert_dicts(self, sections_by_id, ignore_update_time_sections=None, **kwargs):
+        """ Upsert entries given as plain dicts.
+
+        :param sections_by_id: a dict of {id: {section name: section dict}}
+        :param ignore_update_time_sections: Iterable of section names to not update updated_at timestamp
+        :return: a list of failed items
+        """
+        index = self._get_index_name()
+        entries = (
+            {
+                "_id": _id,
+                "_index": index,
+                EsDictFields.SOURCE: {**sections, Sections.MAIN: {**sections.get(Sections.MAIN, {}), "id": _id}},
+            }
+            for _id, sections in sections_by_id.items()
+        )
+        return self.upsert(entries, ignore_update_time_sections=ignore_update_time_sections, **kwargs)
+
+    def _search(self, fields=None):
+        return self.model.search().source(self.get_source(fields))
+
+    # pylint: disable=too-many-arguments
+    def search(self, query=None, filters=None, sort=None, limit=10000, offset=None, fields=None):
+        search = self._search(fields)
         if query:
             search = search.query(query)
         if filters and isinstance(filters, list):
@@ -202,23 +472,123 @@ class BaseManager:
             search = search.sort(*sort)
         return search[offset:limit]
 
-    def scan(self, filters):
-        yield from self.search(filters=filters).scan()
+    # pylint: enable=too-many-arguments
+
+    # pylint: disable=too-many-arguments
+    @instrument("scan")
+    def scan(self, filters, fields=None, sliced=False, slices=None, max_workers=None):
+        """ Scan all records matching filters.
 
+        :param sliced: scroll slices of the search concurrently, see sliced_scan()
+        :param slices: count of slices, the number of index shards by default
+        :param max_workers: count of threads scrolling slices, one thread per slice by default
+        """
+        search = self.search(filters=filters, fields=fields)
+        if sliced:
+            yield from self.sliced_scan(search, slices=slices, max_workers=max_workers)
+        else:
+            yield from search.scan()
+
+    # pylint: enable=too-many-arguments
+
+    # pylint: disable=too-many-arguments
+    @instrument("iter_ids")
+    def iter_ids(self, query=None, filters=None, page_size=IDS_SCAN_PAGE_SIZE, sliced=False, slices=None,
+                 max_workers=None):
+        """ Iterate over ids of all matching records.
+
+        _source is not requested and no model objects are built, only _id of hits is read.
+
+        :param page_size: count of hits per scroll request
+        :param sliced: scroll slices of the search concurrently, see sliced_scan()
+        :param slices: count of slices, the number of index shards by default
+        :param max_workers: count of threads scrolling slices, one thread per slice by default
+        """
+        search = self.search(query=query, filters=filters).extra(from_=0, size=page_size).source(False)
+
+        def scan_ids(_search):
+            hits = scan(connections.get_connection(), query=_search.to_dict(), index=self._get_index_name(),
+                        size=page_size)
+            yield from (hit["_id"] for hit in hits)
+
+        slices = (slices or self.get_number_of_shards()) if sliced else 1
+        if slices <= 1:
+            yield from scan_ids(search)
+            return
+
+        yield from merge_iterators(
+            (scan_ids(search.extra(slice={"id": slice_id, "max": slices})) for slice_id in range(slices)),
+            max_workers=max_workers,
+        )
+
+    # pylint: enable=too-many-arguments
+
+    def sliced_scan(self, search, slices=None, max_workers=None):
+        """ Scan the search with sliced scroll. Slices are scrolled by a pool of threads.
+
+        Hits of all slices are yielded in arbitrary order.
+
+        :param search: search to scan
+        :param slices: count of slices, the number of index shards by default
+        :param max_workers: count of threads scrolling slices, one thread per slice by default
+        """
+        slices = slices or self.get_number_of_shards()
+        if slices <= 1:
+            yield from search.scan()
+            return
+
+        yield from merge_iterators(
+            (search.extra(slice={"id": slice_id, "max": slices}).scan() for slice_id in range(slices)),
+            max_workers=max_workers,
+        )
+
+    @instrument("multi_search")
     def multi_search(self, searches):
-        # pylint: disable=protected-access
-        multi_search = MultiSearch(index=self.model._index._name)
-        multi_search._searches = searches
-        # pylint: enable=protected-access
+        multi_search = MultiSearch(index=self._get_index_name())
+        for search in searches:
+            multi_search = multi_search.add(search)
         return multi_search.execute()
 
-    def _upsert_generator(self, entries, ignore_update_time_sections):
+    @instrument("batch_search")
+    def batch_search(self, searches, batch_size=None, max_workers=None, raise_on_error=True):
+        """ Execute searches with msearch requests.
+
+        :param searches: iterable of Search objects
+        :param batch_size: count of searches per msearch request, ES_MSEARCH_BATCH_SIZE by default
+        :param max_workers: max count of concurrent msearch requests, ES_REQUEST_MAX_WORKERS by default
+        :param raise_on_error: raise MultiSearchItemError of the first failed search.
+        Otherwise MultiSearchItemError objects are returned in place of responses of failed searches
+        :return: list of responses in the order of searches
+        """
+        batches = [list(batch) for batch in chunks(searches, batch_size or ES_MSEARCH_BATCH_SIZE)]
+        batches_results = concurrent_map(self._msearch, batches, max_workers=max_workers or ES_REQUEST_MAX_WORKERS)
+        results = [result for batch_results in batches_results for result in batch_results]
+
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, MultiSearchItemError):
+                    raise result
+        return results
+
+    def _msearch(self, searches):
+        multi_search = MultiSearch()
+        for search in searches:
+            multi_search = multi_search.add(search)
+        responses = connections.get_connection().msearch(index=self._get_index_name(), body=multi_search.to_dict())
+
+        return [
+            MultiSearchItemError(search, response["error"]) if response.get("error") else Response(search, response)
+            for search, response in zip(searches, responses["responses"])
+        ]
+
+    def _upsert_generator(self, entries, ignore_update_time_sections, lean=False):
         """ Generator to create a dict from entity for upsertion.
 
         Controls that only sections field will be upserted.
 
-        :param entries: a list of model objects
+        :param entries: a list of model objects or dicts with _id, _index and _source keys
         :param ignore_update_time_sections: Set of section names to not update updated_at timestamp
+        :param lean: serialize only upsert sections of model objects
         """
 
         def update_timestamp(_entry_dict, timestamp, curr_section):
@@ -231,20 +601,34 @@ class BaseManager:
             timestamp_updated_at = _entry_dict.get(TimestampFields.UPDATED_AT)
 
             _entry_dict[TimestampFields.CREATED_AT] = timestamp if timestamp_created_at is None \
-                else datetime_service.localize(timestamp_created_at)
+                else localize(timestamp_created_at)
 
             # If section is to be ignored but is being newly created, then updated_at timestamp should be set anyway
             if curr_section in ignore_update_time_sections:
                 _entry_dict[TimestampFields.UPDATED_AT] = timestamp if timestamp_updated_at is None \
-                    else datetime_service.localize(timestamp_updated_at)
+                    else localize(timestamp_updated_at)
             else:
                 _entry_dict[TimestampFields.UPDATED_AT] = timestamp
             return _entry_dict
 
+        def localize(value):
+            # dict entries may contain already serialized timestamps
+            return datetime_service.localize(value) if isinstance(value, datetime) else value
+
         now = datetime_service.now()
 
         for entry in entries:
-            entry_dict = entry.to_dict(include_meta=True, skip_empty=False)
+            if isinstance(entry, dict):
+                # upsert sections are updated in place below, so they are copied to keep caller's dicts intact
+                entry_dict = {**self.model.get_bulk_action_meta(), **entry}
+                entry_dict[EsDictFields.SOURCE] = {
+                    name: dict(section or {}) if name in self.upsert_sections else section
+                    for name, section in entry[EsDictFields.SOURCE].items()
+                }
+            elif lean:
+                entry_dict = entry.sections_to_dict(self.upsert_sections, include_meta=True, skip_empty=False)
+            else:
+                entry_dict = entry.to_dict(include_meta=True, skip_empty=False)
             entry_dict[EsDictFields.DOC] = {}
 
             for section in self.upsert_sections:
@@ -267,17 +651,44 @@ class BaseManager:
             yield entry_dict
 
     def _drop_invalid_field_from_section_dict(self, entry, entry_dict, section):
-        # pylint: disable=protected-access
-        doc_mapping = entry._doc_type.mapping.to_dict()[EsDictFields.PROPERTIES]
-        # pylint: enable=protected-access
-
-        section_mapping = doc_mapping[section][EsDictFields.PROPERTIES].keys()
+        model = self.model if isinstance(entry, dict) else type(entry)
+        section_fields = self.get_section_fields(section, model=model)
 
-        invalid_fields = entry_dict[EsDictFields.DOC][section].keys() - section_mapping
+        invalid_fields = entry_dict[EsDictFields.DOC][section].keys() - section_fields
 
         for invalid_field in invalid_fields:
             entry_dict[EsDictFields.DOC][section][invalid_field] = None
 
+    @classmethod
+    def get_section_fields(cls, section, model=None):
+        """ Get field names allowed by the model mapping of the section.
+
+        Mapping is serialized once per model, the result is cached until invalidate_section_fields_cache() call.
+
+        :param section: section name
+        :param model: model class, manager model by default
+        :return: frozenset of field names
+        """
+        model = model or cls.model
+        sections_fields = BaseManager._sections_fields_cache.get(model)
+
+        if sections_fields is None:
+            # pylint: disable=protected-access
+            doc_mapping = model._doc_type.mapping.to_dict()[EsDictFields.PROPERTIES]
+            # pylint: enable=protected-access
+            sections_fields = {
+                name: frozenset(section_mapping[EsDictFields.PROPERTIES].keys())
+                for name, section_mapping in doc_mapping.items()
+            }
+            BaseManager._sections_fields_cache[model] = sections_fields
+
+        return sections_fields[section]
+
+    @classmethod
+    def invalidate_section_fields_cache(cls):
+        """ Drop cached section fields of the manager model. It has to be called after the model mapping changes. """
+        BaseManager._sections_fields_cache.pop(cls.model, None)
+
     def _get_control_section(self):
         return self.sections[0]
 
@@ -313,7 +724,7 @@ class BaseManager:
     # pylint: disable=too-many-arguments
     def search_nonexistent_section_records(self, ids=None, id_field=MAIN_ID_FIELD,
                                            exclude_ids=None, exclude_id_field=None, ignore_deleted=None,
-                                           limit=10000, offset=None):
+                                           limit=10000, offset=None, fields=None):
         control_section = self._get_control_section()
         field_updated_at = f"{control_section}.{TimestampFields.UPDATED_AT}"
 
@@ -338,13 +749,13 @@ class BaseManager:
             {field_updated_at: {"order": SortDirections.ASCENDING}},
             {MAIN_ID_FIELD: {"order": SortDirections.ASCENDING}},
         ]
-        return self.search(query=_query, filters=_filters, sort=_sort, limit=limit, offset=offset)
+        return self.search(query=_query, filters=_filters, sort=_sort, limit=limit, offset=offset, fields=fields)
 
     # pylint: enable=too-many-arguments
     # pylint: disable=too-many-arguments
     def search_outdated_records(self, outdated_at, ids=None, id_field=MAIN_ID_FIELD, exclude_ids=None,
                                 exclude_id_field=None, ignore_deleted=None, get_tracked=None,
-                                offset=None, limit=10000):
+                                offset=None, limit=10000, fields=None):
 
         control_section = self._get_control_section()
         field_updated_at = f"{control_section}.{TimestampFields.UPDATED_AT}"
@@ -375,12 +786,12 @@ class BaseManager:
             {field_updated_at: {"order": SortDirections.ASCENDING}},
             {MAIN_ID_FIELD: {"order": SortDirections.ASCENDING}},
         ]
-        return self.search(query=_query, filters=_filters, sort=_sort, limit=limit, offset=offset)
+        return self.search(query=_query, filters=_filters, sort=_sort, limit=limit, offset=offset, fields=fields)
 
     # pylint: enable=too-many-arguments
     # pylint: disable=too-many-arguments
     def get_never_updated(self, ids=None, id_field=MAIN_ID_FIELD, exclude_ids=None, exclude_id_field=None,
-                          limit=10000, extract_hits=True, ignore_deleted=True, offset=None):
+                          limit=10000, extract_hits=True, ignore_deleted=True, offset=None, fields=None):
         search = self.search_nonexistent_section_records(
             ids=ids,
             id_field=id_field,
@@ -389,6 +800,7 @@ class BaseManager:
             ignore_deleted=ignore_deleted,
             limit=limit,
             offset=offset,
+            fields=fields,
         )
         if not extract_hits:
             return search
@@ -398,7 +810,8 @@ class BaseManager:
     # pylint: enable=too-many-arguments
     # pylint: disable=too-many-arguments
     def get_outdated(self, outdated_at, ids=None, id_field=MAIN_ID_FIELD, exclude_ids=None, exclude_id_field=None,
-                     limit=10000, extract_hits=True, ignore_deleted=True, offset=None, get_tracked=True):
+                     limit=10000, extract_hits=True, ignore_deleted=True, offset=None, get_tracked=True,
+                     fields=None):
         search = self.search_outdated_records(
             outdated_at,
             ids=ids,
@@ -409,6 +822,7 @@ class BaseManager:
             limit=limit,
             offset=offset,
             get_tracked=get_tracked,
+            fields=fields,
         )
         if not extract_hits:
             return search
@@ -416,6 +830,93 @@ class BaseManager:
         return entries
 
     # pylint: enable=too-many-arguments
+    # pylint: disable=too-many-arguments
+    def iter_never_updated(self, ids=None, id_field=MAIN_ID_FIELD, exclude_ids=None, exclude_id_field=None,
+                           ignore_deleted=True, fields=None, page_size=SEARCH_AFTER_PAGE_SIZE, point_in_time=False):
+        """ Iterate over all never updated records in stable order with search_after pagination.
+
+        Unlike get_never_updated(), the count of records is not limited by the max result window.
+
+        :param page_size: count of records per request
+        :param point_in_time: pin all pages to one point in time of the index, see iter_search_after()
+        """
+        search = self.search_nonexistent_section_records(
+            ids=ids,
+            id_field=id_field,
+            exclude_ids=exclude_ids,
+            exclude_id_field=exclude_id_field,
+            ignore_deleted=ignore_deleted,
+            fields=fields,
+        )
+        yield from self.iter_search_after(search, page_size=page_size, point_in_time=point_in_time)
+
+    # pylint: enable=too-many-arguments
+    # pylint: disable=too-many-arguments
+    def iter_outdated(self, outdated_at, ids=None, id_field=MAIN_ID_FIELD, exclude_ids=None, exclude_id_field=None,
+                      ignore_deleted=True, get_tracked=True, fields=None, page_size=SEARCH_AFTER_PAGE_SIZE,
+                      point_in_time=False):
+        """ Iterate over all outdated records in stable order with search_after pagination.
+
+        Unlike get_outdated(), the count of records is not limited by the max result window.
+
+        :param page_size: count of records per request
+        :param point_in_time: pin all pages to one point in time of the index, see iter_search_after()
+        """
+        search = self.search_outdated_records(
+            outdated_at,
+            ids=ids,
+            id_field=id_field,
+            exclude_ids=exclude_ids,
+            exclude_id_field=exclude_id_field,
+            ignore_deleted=ignore_deleted,
+            get_tracked=get_tracked,
+            fields=fields,
+        )
+        yield from self.iter_search_after(search, page_size=page_size, point_in_time=point_in_time)
+
+    # pylint: enable=too-many-arguments
+
+    @instrument("search_after")
+    def iter_search_after(self, search, page_size=SEARCH_AFTER_PAGE_SIZE, point_in_time=False,
+                          keep_alive=POINT_IN_TIME_KEEP_ALIVE):
+        """ Iterate over all hits of the search page by page using search_after.
+
+        Every page costs the same regardless of its depth.
+
+        :param search: search sorted by a unique combination of fields, e.g. updated_at and main.id
+        :param page_size: count of hits per request
+        :param point_in_time: pin all pages to one point in time of the index,
+            requires ES 7.10+ and elasticsearch-py 7.10+ client with open_point_in_time()
+        :param keep_alive: how long the point in time is kept between requests
+        """
+        search = search[:page_size]
+        client = connections.get_connection()
+        pit_id = None
+        if point_in_time:
+            pit_id = client.open_point_in_time(index=self._get_index_name(), keep_alive=keep_alive)["id"]
+            # the index is defined by point in time
+            search = search.index()
+
+        try:
+            search_after = None
+            while True:
+                page = search
+                if pit_id:
+                    page = page.extra(pit={"id": pit_id, "keep_alive": keep_alive})
+                if search_after is not None:
+                    page = page.extra(search_after=search_after)
+
+                response = page.execute()
+                pit_id = getattr(response, "pit_id", pit_id)
+                hits = response.hits
+                yield from hits
+
+                if len(hits) < page_size:
+                    break
+                search_after = list(hits[-1].meta.sort)
+        finally:
+            if pit_id:
+                client.close_point_in_time(body={"id": pit_id})
 
     def get_by_forced_filter(self):
         forced_filter = self.forced_filters()
@@ -470,7 +971,7 @@ class BaseManager:
         }
         return count_aggs
 
-    def _get_count_exists_aggs_result(self, search, properties=None):
+    def _get_count_exists_filters(self, properties=None):
         properties = properties or self.count_exists_aggregation_fields + self.count_missing_aggregation_fields
         filters = {
             **{
@@ -486,18 +987,64 @@ class BaseManager:
         filters = self.adapt_ias_verified_filter(filters)
         filters = self.adapt_last_vetted_at_exists_filter(filters)
 
-        result = {
-            key: search.filter(value).count()
+        return {
+            key: value
             for key, value in filters.items()
             if key in properties
         }
 
-        return result
+    def _get_count_exists_aggs(self, properties=None):
+        """ Count of records by every exists/missing property as one filters aggregation """
+        filters = self._get_count_exists_filters(properties)
+        if not filters:
+            return {}
+
+        return {
+            COUNT_EXISTS_AGGREGATION: {
+                "filters": {
+                    "filters": {key: value.to_dict() for key, value in filters.items()}
+                }
+            }
+        }
 
-    def get_aggregation(self, search, size=0, properties=None):
+    @staticmethod
+    def _pop_count_exists_aggs_result(aggregations_result):
+        """ Pop the aggregation built by _get_count_exists_aggs() and convert it to {property: count} """
+        buckets = aggregations_result.pop(COUNT_EXISTS_AGGREGATION, {}).get("buckets", {})
+        return {key: bucket["doc_count"] for key, bucket in buckets.items()}
+
+    @instrument("get_aggregation")
+    def get_aggregation(self, search=None, size=0, properties=None):
+        """ Aggregations result of the search, served from aggregation_cache if it is set.
+
+        Cached results are keyed by the manager class, search body, size, properties and context.
+        """
         if not properties:
             return None
+        if self.aggregation_cache is None:
+            return self._get_aggregation(search, size, properties)
+
+        key = self._get_aggregation_cache_key(search, size, properties)
+        aggregations_result = self.aggregation_cache.get(key)
+        if aggregations_result is None:
+            aggregations_result = self._get_aggregation(search, size, properties)
+            self.aggregation_cache.set(key, aggregations_result)
+        return aggregations_result
+
+    def _get_aggregation_cache_key(self, search, size, properties):
+        search_query = search.to_dict() if search else None
+        return self.aggregation_cache.make_key(
+            f"{self.__class__.__module__}.{self.__class__.__name__}",
+            search_query, size, sorted(properties), self.context,
+        )
 
+    def _get_aggregation(self, search, size, properties):
+        aggregations_search = self._build_aggregation_search(search, size, properties)
+        aggregations_result = aggregations_search.execute().aggregations.to_dict()
+        return self._adapt_aggregation_result(aggregations_result)
+
+    def _build_aggregation_search(self, search, size, properties):
+        """ Search requesting all aggregations of properties """
         aggregation_dict = {
             **self._get_range_aggs(),
             **self._get_count_aggs(),
@@ -513,8 +1060,12 @@ class BaseManager:
             "size": size,
             "aggs": aggregation_dict
         })
-        aggregations_search.update_from_dict(search.to_dict())
-        aggregations_result = aggregations_search.execute().aggregations.to_dict()
+        if search:
+            aggregations_search.update_from_dict(search.to_dict())
+        return aggregations_search
+
+    def _adapt_aggregation_result(self, aggregations_result):
+        """ Convert raw aggregations of _build_aggregation_search() to the get_aggregation() result """
         aggregations_result = self.adapt_is_viral_aggregation(aggregations_result)
         return aggregations_result
 
@@ -682,6 +1233,13 @@ class BaseManager:
         return self.model._index.updateByQuery().filter(filter_query)
         # pylint: enable=protected-access
 
+    @instrument("update_by_query")
+    def _execute_update(self, update):
+        """ Execute update by query. Cached documents can't be matched by query, so all of them are invalidated """
+        result = update.execute()
+        self._invalidate_document_cache()
+        return result
+
     def filter_items_related_to_segments(self, segment_ids):
         """
         :param segment_ids: List[<UUID>] - list of segments uuids
@@ -706,7 +1264,7 @@ class BaseManager:
         update = self.update(filter_query) \
             .script(**script) \
             .params(**kwargs)
-        return update.execute()
+        return self._execute_update(update)
 
     def update_blocklist(self, filter_query, blocklist, **kwargs):
         if Sections.CUSTOM_PROPERTIES not in self.upsert_sections:
@@ -722,7 +1280,7 @@ class BaseManager:
         update = self.update(filter_query) \
             .script(**script) \
             .params(**kwargs)
-        return update.execute()
+        return self._execute_update(update)
 
     def update_rescore(self, filter_query, rescore=False, **kwargs):
         """ Update by query to update custom_properties.rescore boolean """
@@ -739,7 +1297,7 @@ class BaseManager:
         update = self.update(filter_query) \
             .script(**script) \
             .params(**kwargs)
-        return update.execute()
+        return self._execute_update(update)
 
     def remove_sections(self, filter_query, sections, proceed_conflict=False):
         if not set(sections).issubset(set(self.allowed_sections)):
@@ -755,7 +1313,7 @@ class BaseManager:
             .script(**script)
         if proceed_conflict is True:
             update = update.params(conflicts="proceed")
-        return update.execute()
+        return self._execute_update(update)
 
     def add_to_segment(self, filter_query, segment_uuid):
         if Sections.SEGMENTS not in self.upsert_sections:
@@ -767,9 +1325,9 @@ class BaseManager:
                 now=datetime_service.now().isoformat(),
             )
         )
-        return self.update(filter_query) \
-            .script(**script) \
-            .execute()
+        update = self.update(filter_query) \
+            .script(**script)
+        return self._execute_update(update)
 
     def add_to_segment_by_ids(self, ids, segment_uuid):
         if Sections.SEGMENTS not in self.upsert_sections:
@@ -795,12 +1353,21 @@ class BaseManager:
                 now=datetime_service.now().isoformat(),
             )
         )
-        return self.update(filter_query) \
-            .script(**script) \
-            .execute()
+        update = self.update(filter_query) \
+            .script(**script)
+        return self._execute_update(update)
 
     @classmethod
-    def fetch_percentiles(cls, field):
+    def fetch_percentiles(cls, field, sharded=True, method=PERCENTILES_TDIGEST):
+        """ Percentiles of the field.
+
+        :param sharded: average percentiles of every shard requesting shards one by one.
+        Otherwise ES merges digests of all shards in a single request, see fetch_all_percentiles()
+        :param method: PERCENTILES_TDIGEST or PERCENTILES_HDR, used if not sharded
+        """
+        if not sharded:
+            return cls.fetch_all_percentiles([field], method=method)[field]
+
         number_of_shards = cls.get_number_of_shards()
         aggregations = {
             "aggs": {
@@ -831,6 +1398,57 @@ class BaseManager:
 
         return percentiles
 
+    # pylint: disable=too-many-arguments
+    @classmethod
+    def fetch_all_percentiles(cls, fields=None, method=PERCENTILES_TDIGEST, compression=None,
+                              number_of_significant_value_digits=None, percents=AGGREGATION_PERCENTS):
+        """ Percentiles of all fields in one request.
+
+        Every shard builds a t-digest or HDR histogram of the field and the coordinating node merges them,
+        so results are computed over the whole index instead of averaging per-shard percentiles.
+
+        :param fields: percentiles_aggregation_fields by default
+        :param method: PERCENTILES_TDIGEST or PERCENTILES_HDR
+        :param compression: t-digest compression, higher is more accurate and uses more memory
+        :param number_of_significant_value_digits: HDR histogram precision
+        :return: {field: OrderedDict of percentiles by str(float(percent))}
+        """
+        fields = fields or cls.percentiles_aggregation_fields
+        if not fields:
+            return {}
+
+        options = {}
+        if method == PERCENTILES_HDR and number_of_significant_value_digits is not None:
+            options = {"hdr": {"number_of_significant_value_digits": number_of_significant_value_digits}}
+        elif method == PERCENTILES_HDR:
+            options = {"hdr": {}}
+        elif compression is not None:
+            options = {"tdigest": {"compression": compression}}
+
+        aggregations = {
+            field: {
+                "percentiles": {
+                    "field": field,
+                    "percents": percents,
+                    **options,
+                }
+            }
+            for field in fields
+        }
+        result = cls.model.search() \
+            .update_from_dict({"aggs": aggregations, "size": 0}) \
+            .execute().aggregations.to_dict()
+
+        result_keys = [str(float(key)) for key in percents]
+        return {
+            field: OrderedDict([
+                (key, result[field]["values"].get(key))
+                for key in result_keys
+            ])
+            for field in fields
+        }
+    # pylint: enable=too-many-arguments
+
     @classmethod
     def get_number_of_shards(cls):
         # pylint: disable=protected-access
@@ -855,12 +1473,16 @@ class BaseManager:
         # pylint: disable=protected-access
         monitor = Monitor(self.model._index._name)
         # pylint: enable=protected-access
-        data = dict(
-            cluster_name=monitor.get_cluster_name(),
-            warnings=monitor.get_warnings(self._get_enabled_monitoring_warnings()),
-            info=monitor.get_info(*self._get_enabled_monitoring_params_info()),
-            alerts=monitor.get_alerts(self._get_enabled_monitoring_alerts())
+        # independent parts of the snapshot are requested concurrently, identical counts are requested once
+        getters = dict(
+            cluster_name=monitor.get_cluster_name,
+            warnings=partial(monitor.get_warnings, self._get_enabled_monitoring_warnings()),
+            info=partial(monitor.get_info, *self._get_enabled_monitoring_params_info()),
+            alerts=partial(monitor.get_alerts, self._get_enabled_monitoring_alerts()),
         )
+        with monitor.snapshot():
+            results = concurrent_map(lambda getter: getter(), getters.values(), max_workers=len(getters))
+        data = dict(zip(getters, results))
         return data
 
 
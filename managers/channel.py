@@ -125,21 +125,25 @@ class ChannelManager(BaseManager):
             if key in properties
         }
 
-    def get_aggregation(self, search=None, size=0, properties=None):
-        if not properties:
-            return None
-        if not search:
-            search = self._search()
+    def _build_aggregation_search(self, search, size, properties):
+        # pylint: disable=protected-access
+        # a copy is updated, so the caller's search and its cache key stay the same
+        search = search._clone() if search else self._search()
+        # pylint: enable=protected-access
 
-        aggregation = self.__get_aggregation_dict(properties)
+        aggregation = {
+            **self.__get_aggregation_dict(properties),
+            **self._get_count_exists_aggs(properties),
+        }
 
         search.update_from_dict({
             "size": size,
             "aggs": aggregation
         })
-        aggregations_result = search.execute().aggregations.to_dict()
+        return search
 
-        count_exists_aggs_result = self._get_count_exists_aggs_result(search, properties)
+    def _adapt_aggregation_result(self, aggregations_result):
+        count_exists_aggs_result = self._pop_count_exists_aggs_result(aggregations_result)
 
         aggregations_result.update(count_exists_aggs_result)
 
@@ -3,7 +3,8 @@ from typing import List
 
 from pycountry import languages
 
-from es_components.config import ES_CHUNK_SIZE
+from es_components.config import ES_REQUEST_LIMIT
+from es_components.config import ES_REQUEST_MAX_WORKERS
 from es_components.constants import CONTENT_OWNER_ID_FIELD
 from es_components.constants import MAIN_ID_FIELD
 from es_components.constants import Sections
@@ -11,6 +12,7 @@ from es_components.constants import SortDirections
 from es_components.constants import TimestampFields
 from es_components.constants import VIDEO_CHANNEL_ID_FIELD
 from es_components.managers.base import BaseManager
+from es_components.metrics import instrument
 from es_components.models.channel import Channel
 from es_components.models.video import Video
 from es_components.query_builder import QueryBuilder
@@ -18,8 +20,12 @@ from es_components.monitor import Emergency
 from es_components.monitor import Warnings
 from es_components.utils import add_brand_safety_labels
 from es_components.utils import add_sentiment_labels
+from es_components.utils import chunks
+from es_components.utils import concurrent_map
 from es_components.languages import LANGUAGES
 
+# max count of buckets in a response with default search.max_buckets
+TOTALS_COMPOSITE_PAGE_SIZE = 10000
 
 RANGE_AGGREGATION = (
     "stats.views",
@@ -99,10 +105,9 @@ class VideoManager(BaseManager):
     count_missing_aggregation_fields = COUNT_MISSING_AGGREGATION
     use_admin_brand_safety_labels = False
 
-    def get_all_video_ids_generator(self, channel_id):
+    def get_all_video_ids_generator(self, channel_id, sliced=False, slices=None):
         _query = self.by_channel_ids_query(channel_id)
-        videos_generator = self.model.search().source(Sections.MAIN).query(_query).scan()
-        yield from (video.main.id for video in videos_generator)
+        yield from self.iter_ids(query=_query, sliced=sliced, slices=slices)
 
     def by_channel_ids_query(self, channels_ids, invert=False):
         query = QueryBuilder().build()
@@ -155,6 +160,15 @@ class VideoManager(BaseManager):
         total = result.hits.total.value
         return total
 
+    def get_total_counts_for_channels(self, channels_ids_groups, batch_size=None, max_workers=None):
+        """ get_total_count_for_channels() of every group of channel ids with batched msearch requests """
+        searches = [
+            self.search(query=self.by_channel_ids_query(channels_ids)).extra(size=0)
+            for channels_ids in channels_ids_groups
+        ]
+        responses = self.batch_search(searches, batch_size=batch_size, max_workers=max_workers)
+        return [response.hits.total.value for response in responses]
+
     def get_total_count_for_content_owners(self, content_owner_ids):
         search = self.search(query=self.by_content_owner_ids_query(content_owner_ids))
         result = search.execute()
@@ -166,7 +180,26 @@ class VideoManager(BaseManager):
         result = self.get_totals_by_channel_ids(channel_ids)
         return result
 
-    def get_totals_by_channel_ids(self, channel_ids: List[str]):
+    @instrument("get_totals_by_channel_ids")
+    def get_totals_by_channel_ids(self, channel_ids: List[str], chunk_size=None, max_workers=None):
+        """ Count of videos of every channel.
+
+        :param chunk_size: count of channel ids per request, ES_REQUEST_LIMIT by default
+        :param max_workers: max count of chunks counted concurrently, ES_REQUEST_MAX_WORKERS by default
+        :return: OrderedDict of counts in the order of channel_ids
+        """
+        ids_chunks = [list(_ids) for _ids in chunks(OrderedDict.fromkeys(channel_ids), chunk_size or ES_REQUEST_LIMIT)]
+        counts = {}
+        for chunk_counts in concurrent_map(self.__get_totals_by_channel_ids_chunk, ids_chunks,
+                                           max_workers=max_workers or ES_REQUEST_MAX_WORKERS):
+            counts.update(chunk_counts)
+
+        result = OrderedDict((channel_id, counts.get(channel_id, 0)) for channel_id in channel_ids)
+
+        return result
+
+    def __get_totals_by_channel_ids_chunk(self, channel_ids):
+        """ Page a composite aggregation by channel id over the chunk of channel ids """
         query = {
             "bool": {
                 "must": [
@@ -174,26 +207,26 @@ class VideoManager(BaseManager):
                 ]
             }
         }
-        aggrenation_name = "count"
-        aggregations = {
-            aggrenation_name: {
-                "terms": {
-                    "field": "channel.id",
-                    "size": ES_CHUNK_SIZE,
-                },
-            }
+        aggregation_name = "count"
+        composite = {
+            "size": min(len(channel_ids), TOTALS_COMPOSITE_PAGE_SIZE),
+            "sources": [{"channel_id": {"terms": {"field": "channel.id"}}}],
         }
-
-        result = self.search(query=query) \
-                     .update_from_dict({"aggs": aggregations, "size": 0}) \
-                     .execute()
-
-        aggregation_buckets = result["aggregations"][aggrenation_name]["buckets"]
-
-        aggregations_map = {bucket["key"]: bucket["doc_count"] for bucket in aggregation_buckets}
-        result = OrderedDict((channel_id, aggregations_map.get(channel_id, 0)) for channel_id in channel_ids)
-
-        return result
+        counts = {}
+        while True:
+            result = self.search(query=query) \
+                         .update_from_dict({"aggs": {aggregation_name: {"composite": composite}}, "size": 0}) \
+                         .execute()
+            aggregation = result["aggregations"][aggregation_name]
+            for bucket in aggregation["buckets"]:
+                counts[bucket["key"]["channel_id"]] = bucket["doc_count"]
+
+            after_key = aggregation.to_dict().get("after_key")
+            if not after_key or len(aggregation["buckets"]) < composite["size"]:
+                break
+            composite = {**composite, "after": after_key}
+
+        return counts
 
     def __get_aggregation_dict(self, properties):
         aggregation = {
@@ -206,24 +239,26 @@ class VideoManager(BaseManager):
             if key in properties
         }
 
-    def get_aggregation(self, search=None, size=0, properties=None):
-        if not properties:
-            return None
+    def _build_aggregation_search(self, search, size, properties):
         if not search:
             search = self._search()
 
         search_query = search.to_dict()
 
-        aggregations = self.__get_aggregation_dict(properties)
+        aggregations = {
+            **self.__get_aggregation_dict(properties),
+            **self._get_count_exists_aggs(properties),
+        }
 
         aggregations_search = self._search().update_from_dict({
             "size": size,
             "aggs": aggregations
         })
         aggregations_search.update_from_dict(search_query)
-        aggregations_result = aggregations_search.execute().aggregations.to_dict()
+        return aggregations_search
 
-        count_exists_aggs_result = self._get_count_exists_aggs_result(search, properties)
+    def _adapt_aggregation_result(self, aggregations_result):
+        count_exists_aggs_result = self._pop_count_exists_aggs_result(aggregations_result)
         aggregations_result.update(count_exists_aggs_result)
         aggregations_result = add_brand_safety_labels(aggregations_result, self.use_admin_brand_safety_labels)
         aggregations_result = add_sentiment_labels(aggregations_result)
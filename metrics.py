@@ -0,0 +1,262 @@
+import inspect
+import math
+import time
+from functools import wraps
+from threading import Lock
+
+from es_components.bulk import get_adaptive_chunk_sizes
+from es_components.config import ES_METRICS_ENABLED
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f"{name}=\"{_escape_label_value(value)}\"" for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class BaseMetric:
+    """ Metric with values by label values. Label values are passed as keyword arguments """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def _get_key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key):
+        return tuple(zip(self.labelnames, key))
+
+    def collect(self):
+        """ Lines of the metric samples in the text exposition format """
+        raise NotImplementedError
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        return "\n".join(lines + list(self.collect()))
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(BaseMetric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._get_key(labels), 0)
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+
+
+class Gauge(BaseMetric):
+    """ Gauge set explicitly or collected by collect_func returning {tuple of label values: value} on render """
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect_func=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect_func = collect_func
+
+    def set(self, value, **labels):
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        if self.collect_func is not None:
+            values.update(self.collect_func())
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+
+
+class Histogram(BaseMetric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(set(buckets) | {math.inf}))
+
+    def observe(self, value, **labels):
+        key = self._get_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def get_count(self, **labels):
+        counts, _ = self._values.get(self._get_key(labels), ((), 0))
+        return sum(counts)
+
+    def collect(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), collect_func=None):
+        return self.register(Gauge(name, documentation, labelnames, collect_func=collect_func))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self):
+        """ All metrics in the Prometheus text exposition format """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def clear(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+OPERATION_LABELS = ("manager", "operation", "index")
+OPERATIONS = REGISTRY.counter(
+    "es_components_operations_total", "Count of manager operations", OPERATION_LABELS)
+OPERATION_ERRORS = REGISTRY.counter(
+    "es_components_operation_errors_total", "Count of manager operations failed with an exception", OPERATION_LABELS)
+OPERATION_DOCUMENTS = REGISTRY.counter(
+    "es_components_operation_documents_total", "Count of documents read or written by manager operations",
+    OPERATION_LABELS)
+OPERATION_DURATION = REGISTRY.histogram(
+    "es_components_operation_duration_seconds", "Duration of manager operations", OPERATION_LABELS)
+BULK_CHUNK_SIZE = REGISTRY.gauge(
+    "es_components_bulk_chunk_size", "Current adaptive bulk chunk size", ("index",),
+    collect_func=lambda: {(name,): chunk_size for name, chunk_size in get_adaptive_chunk_sizes().items()})
+
+
+def _get_operation_labels(manager, operation):
+    # pylint: disable=protected-access
+    return dict(manager=manager.__class__.__name__, operation=operation, index=manager._get_index_name())
+    # pylint: enable=protected-access
+
+
+def count_documents(manager, operation, count):
+    """ Add count of documents read or written by the manager operation """
+    if ES_METRICS_ENABLED:
+        OPERATION_DOCUMENTS.inc(count, **_get_operation_labels(manager, operation))
+
+
+def instrument(operation, documents=None):
+    """ Decorator of manager methods counting calls, errors and duration labelled by manager, operation and index.
+
+    Duration of generator methods covers the whole iteration and every yielded item is counted as a document.
+
+    :param operation: operation name
+    :param documents: function returning count of documents by the method result, e.g. len
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def generator_wrapper(self, *args, **kwargs):
+                if not ES_METRICS_ENABLED:
+                    yield from func(self, *args, **kwargs)
+                    return
+                labels = _get_operation_labels(self, operation)
+                OPERATIONS.inc(**labels)
+                started_at = time.monotonic()
+                count = 0
+                try:
+                    for item in func(self, *args, **kwargs):
+                        count += 1
+                        yield item
+                except Exception:
+                    OPERATION_ERRORS.inc(**labels)
+                    raise
+                finally:
+                    OPERATION_DURATION.observe(time.monotonic() - started_at, **labels)
+                    OPERATION_DOCUMENTS.inc(count, **labels)
+
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not ES_METRICS_ENABLED:
+                return func(self, *args, **kwargs)
+            labels = _get_operation_labels(self, operation)
+            OPERATIONS.inc(**labels)
+            started_at = time.monotonic()
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception:
+                OPERATION_ERRORS.inc(**labels)
+                raise
+            finally:
+                OPERATION_DURATION.observe(time.monotonic() - started_at, **labels)
+            if documents is not None and result is not None:
+                OPERATION_DOCUMENTS.inc(documents(result), **labels)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def render_metrics():
+    return REGISTRY.render()
+
+
+def metrics_app(environ, start_response):
+    """ WSGI application serving metrics, e.g. wsgiref.simple_server.make_server("", 9100, metrics_app) """
+    # pylint: disable=unused-argument
+    body = render_metrics().encode("utf-8")
+    start_response("200 OK", [("Content-Type", CONTENT_TYPE), ("Content-Length", str(len(body)))])
+    return [body]
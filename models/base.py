@@ -7,6 +7,7 @@ from elasticsearch_dsl import Keyword
 from elasticsearch_dsl import Object
 from elasticsearch_dsl import Text
 from elasticsearch_dsl.utils import AttrList
+from elasticsearch_dsl.utils import DOC_META_FIELDS
 
 from es_components.constants import Sections
 from es_components.stats import History
@@ -140,6 +141,43 @@ class BaseDocument(Document):
 
     # pylint: enable=redefined-builtin
 
+    def sections_to_dict(self, sections, include_meta=False, skip_empty=True):
+        """ Serialize only given sections.
+
+        The result has the same shape as to_dict() returns, other sections are not serialized at all.
+
+        :param sections: iterable of section names
+        :param include_meta: include document metadata and put sections into _source
+        :param skip_empty: skip sections with empty values
+        """
+        # pylint: disable=protected-access
+        mapping = self._doc_type.mapping
+        sections_dict = {}
+        for section in sections:
+            value = mapping[section].serialize(self._d_.get(section))
+            if skip_empty and value in ([], {}, None):
+                continue
+            sections_dict[section] = value
+
+        if not include_meta:
+            return sections_dict
+
+        meta = {"_" + key: self.meta[key] for key in DOC_META_FIELDS if key in self.meta}
+        index = self._get_index(required=False)
+        # pylint: enable=protected-access
+        if index is not None:
+            meta["_index"] = index
+
+        meta["_source"] = sections_dict
+        return meta
+
+    @classmethod
+    def get_bulk_action_meta(cls):
+        """ Bulk metadata of upsert actions of the model, e.g. retry_on_conflict.
+        Added to actions built from plain dicts, to_dict() of models adds it on its own
+        """
+        return {}
+
     def init_main(self, **kwargs):
         if self.main:
             raise Exception("Main section already exists. Cannot reinitialize it.")
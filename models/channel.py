@@ -254,7 +254,22 @@ class Channel(BaseDocument):
             # Thus we need to check type beforehand.
             # pylint: disable=unexpected-keyword-arg
             res_dict["_source"]["general_data"] = self.general_data.to_dict(skip_empty=skip_empty)
-            res_dict["retry_on_conflict"] = 3  # VIQ2-161: Trying to fix: BulkIndexError
+            res_dict.update(self.get_bulk_action_meta())
+            # pylint: enable=unexpected-keyword-arg
+        return res_dict
+
+    @classmethod
+    def get_bulk_action_meta(cls):
+        return {"retry_on_conflict": 3}  # VIQ2-161: Trying to fix: BulkIndexError
+
+    def sections_to_dict(self, sections, include_meta=False, skip_empty=True):
+        """ Serialize only given sections the same way as to_dict() does. """
+        res_dict = super(Channel, self).sections_to_dict(sections, include_meta=include_meta, skip_empty=skip_empty)
+        if isinstance(self.general_data, ChannelSectionGeneralData) and "_source" in res_dict:
+            # pylint: disable=unexpected-keyword-arg
+            if Sections.GENERAL_DATA in sections:
+                res_dict["_source"]["general_data"] = self.general_data.to_dict(skip_empty=skip_empty)
+            res_dict.update(self.get_bulk_action_meta())
             # pylint: enable=unexpected-keyword-arg
         return res_dict
 
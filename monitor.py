@@ -1,9 +1,15 @@
+import json
 from collections import defaultdict
+from contextlib import ExitStack
+from contextlib import contextmanager
+from concurrent.futures import Future
+from threading import Lock
 
 from es_components.connections import connections
 from es_components.constants import Sections
 from es_components.constants import TimestampFields
 from es_components.query_builder import QueryBuilder
+from es_components.utils import concurrent_map
 
 
 class BaseWarning:
@@ -67,6 +73,11 @@ class BaseMonitor:
     def get_warnings(self, *args, **kwargs):
         raise NotImplementedError
 
+    @contextmanager
+    def snapshot(self):
+        """ Context of one monitoring snapshot, e.g. one get_monitoring_data() call """
+        yield self
+
 
 class MonitoringIndex(BaseMonitor):
     name = "index"
@@ -133,13 +144,64 @@ class MonitoringPerformance(BaseMonitor):
         self._emergency_check_func = {
             Emergency.NoneRecordsUpdated.name: self.__check_none_records_updated
         }
+        # counts of the current snapshot, {query JSON: Future of count}. None outside of snapshots
+        self._counts = None
+        self._counts_lock = Lock()
+        self._snapshot_depth = 0
+
+    @contextmanager
+    def snapshot(self):
+        """ Count identical queries once within the block, counts are requested again in the next snapshot """
+        with self._counts_lock:
+            if not self._snapshot_depth:
+                self._counts = {}
+            self._snapshot_depth += 1
+        try:
+            yield self
+        finally:
+            with self._counts_lock:
+                self._snapshot_depth -= 1
+                if not self._snapshot_depth:
+                    self._counts = None
+
+    def __get_memoized_counts(self, queries, count_func):
+        """ Counts of queries requested once per snapshot, see snapshot()
+
+        :param queries: a dict of {name: query}
+        :param count_func: function counting a dict of queries not counted yet, returns {name: count}.
+        Queries counted by other threads at the moment are awaited
+        """
+        futures = {}
+        owned = {}
+        with self._counts_lock:
+            # outside of snapshots every query is counted
+            counts_memo = self._counts if self._counts is not None else {}
+            for name, query in queries.items():
+                key = json.dumps(query.to_dict() if query else None, sort_keys=True)
+                if key not in counts_memo:
+                    counts_memo[key] = owned[name] = Future()
+                futures[name] = counts_memo[key]
+
+        if owned:
+            try:
+                counts = count_func({name: queries[name] for name in owned})
+            except Exception as error:
+                for future in owned.values():
+                    future.set_exception(error)
+                raise
+            for name, future in owned.items():
+                future.set_result(counts[name])
+
+        return {name: future.result() for name, future in futures.items()}
 
     def __get_count(self, query=None):
-        body = {}
-        if query:
-            body.update(query=query)
-        count = self.connection.count(index=self.index_name, body=body).get("count")
-        return count
+        def count(queries):
+            body = {}
+            if query:
+                body.update(query=query)
+            return {name: self.connection.count(index=self.index_name, body=body).get("count") for name in queries}
+
+        return self.__get_memoized_counts({"count": query}, count)["count"]
 
     def __timestamp_query_generator(self, section=Sections.MAIN, timestamp_field=TimestampFields.CREATED_AT):
         for key, days in self.DAYS_LIST:
@@ -148,7 +210,32 @@ class MonitoringPerformance(BaseMonitor):
                 .gt(f"now-{86400 * days}s/s") \
                 .get()
 
-    def get_section_info(self, section, ignore_deleted=False):
+    def __get_counts(self, queries):
+        """ Count records matching every query with one filters aggregation request
+
+        :param queries: a dict of {name: query}
+        :return: a dict of {name: count}
+        """
+        return self.__get_memoized_counts(queries, self.__request_counts)
+
+    def __request_counts(self, queries):
+        if not queries:
+            return {}
+        body = {
+            "size": 0,
+            "aggs": {
+                "counts": {
+                    "filters": {
+                        "filters": {name: query.to_dict() for name, query in queries.items()}
+                    }
+                }
+            }
+        }
+        buckets = self.connection.search(index=self.index_name, body=body)["aggregations"]["counts"]["buckets"]
+        return {name: bucket["doc_count"] for name, bucket in buckets.items()}
+
+    def __section_info_queries(self, section, ignore_deleted=False):
+        """ Queries of get_section_info() keyed by (section, info key, days key) """
         # pylint: disable=no-member
         filled_query = QueryBuilder().build().must().exists().field(section).get()
         missed_query = QueryBuilder().build().must_not().exists().field(section).get()
@@ -157,29 +244,44 @@ class MonitoringPerformance(BaseMonitor):
             ignore_deleted_query = QueryBuilder().build().must_not().exists().field(Sections.DELETED).get()
             filled_query = filled_query & ignore_deleted_query
             missed_query = missed_query & ignore_deleted_query
+        # pylint: enable=no-member
 
-        filled = self.__get_count(query=filled_query)
-        missed = self.__get_count(query=missed_query)
-
-        updated_by_days = {
-            key: self.__get_count(query=query)
-            for key, query in self.__timestamp_query_generator(section, timestamp_field=TimestampFields.UPDATED_AT)
+        queries = {
+            (section, "filled", None): filled_query,
+            (section, "missed", None): missed_query,
         }
+        for info_key, timestamp_field in (("updated_by_days", TimestampFields.UPDATED_AT),
+                                          ("created_by_days", TimestampFields.CREATED_AT)):
+            for key, query in self.__timestamp_query_generator(section, timestamp_field=timestamp_field):
+                queries[(section, info_key, key)] = query
+        return queries
+
+    def __get_sections_info(self, sections, ignore_deleted=False, extra_queries=None):
+        """ Info of all sections and counts of extra queries with one request """
+        queries = {}
+        for section in sections:
+            queries.update(self.__section_info_queries(section, ignore_deleted))
+        named_queries = {":".join(str(part) for part in name): query for name, query in queries.items()}
+        counts = self.__get_counts({**named_queries, **(extra_queries or {})})
 
-        created_by_days = {
-            key: self.__get_count(query=query)
-            for key, query in self.__timestamp_query_generator(section, timestamp_field=TimestampFields.CREATED_AT)
+        info_by_sections = {
+            section: dict(filled=None, missed=None, updated_by_days={}, created_by_days={})
+            for section in sections
         }
-        # pylint: enable=no-member
+        for name, named_query in zip(queries, named_queries):
+            section, info_key, key = name
+            if key is None:
+                info_by_sections[section][info_key] = counts[named_query]
+            else:
+                info_by_sections[section][info_key][key] = counts[named_query]
 
-        return dict(
-            filled=filled,
-            missed=missed,
-            updated_by_days=updated_by_days,
-            created_by_days=created_by_days
-        )
+        return info_by_sections, {name: counts[name] for name in extra_queries or {}}
+
+    def get_section_info(self, section, ignore_deleted=False):
+        info_by_sections, _ = self.__get_sections_info([section], ignore_deleted)
+        return info_by_sections[section]
 
-    def __get_skipped(self, skipped_sections):
+    def __get_skipped_query(self, skipped_sections):
         queries = None
 
         for section in skipped_sections:
@@ -193,24 +295,26 @@ class MonitoringPerformance(BaseMonitor):
 
             queries = queries | __queries if queries is not None else __queries
 
-        return self.__get_count(query=queries) if queries else None
+        return queries
 
     # pylint: disable=no-member
-    def __get_deleted(self):
-        return self.__get_count(query=QueryBuilder().build().must().exists().field(Sections.DELETED).get())
+    @staticmethod
+    def __get_deleted_query():
+        return QueryBuilder().build().must().exists().field(Sections.DELETED).get()
 
     # pylint: enable=no-member
 
     # pylint: disable=arguments-differ
     def get_info(self, sections, skipped_sections, *args):
-        info_by_sections = {}
-        for section in sections:
-            info_by_sections.update({
-                section: self.get_section_info(section, *args)
-            })
+        general_queries = {"deleted": self.__get_deleted_query()}
+        skipped_query = self.__get_skipped_query(skipped_sections)
+        if skipped_query:
+            general_queries["skipped"] = skipped_query
+
+        info_by_sections, general_counts = self.__get_sections_info(sections, *args, extra_queries=general_queries)
         general = {
-            "deleted": self.__get_deleted(),
-            "skipped": self.__get_skipped(skipped_sections)
+            "deleted": general_counts["deleted"],
+            "skipped": general_counts.get("skipped")
         }
         return dict(info_by_sections=info_by_sections, general=general)
 
@@ -326,12 +430,18 @@ class Monitor(BaseMonitor):
         name = name.split(":")[-1]
         return name
 
+    @contextmanager
+    def snapshot(self):
+        with ExitStack() as stack:
+            for monitor in self.__monitors:
+                stack.enter_context(monitor.snapshot())
+            yield self
+
     # pylint: disable=arguments-differ
     def get_info(self, *args):
-        results = {}
-        for monitor in self.__monitors:
-            results[monitor.name] = monitor.get_info(*args)
-        return results
+        infos = concurrent_map(lambda monitor: monitor.get_info(*args), self.__monitors,
+                               max_workers=len(self.__monitors))
+        return {monitor.name: info for monitor, info in zip(self.__monitors, infos)}
 
     # pylint: enable=arguments-differ
 
@@ -0,0 +1,167 @@
+import json
+import sys
+from threading import Lock
+
+from es_components.config import ES_SLOW_QUERY_LOG_SIZE
+from es_components.config import ES_SLOW_QUERY_THRESHOLD
+from es_components.tracing import TracingHook
+from es_components.tracing import add_hook
+from es_components.tracing import remove_hook
+
+LITERAL_PLACEHOLDER = "?"
+# modules skipped looking for the code which made a request
+LIBRARY_MODULES = ("es_components.", "elasticsearch", "urllib3", "requests", "contextlib", "concurrent", "threading")
+
+
+def _strip_literals(value):
+    if isinstance(value, dict):
+        return {key: _strip_literals(item) for key, item in value.items()}
+    if isinstance(value, list):
+        stripped = []
+        for item in value:
+            item = _strip_literals(item)
+            if item not in stripped:
+                stripped.append(item)
+        return stripped
+    return LITERAL_PLACEHOLDER
+
+
+def fingerprint_query(body):
+    """ Structure of the request body with literal values replaced with "?".
+    Lists of literals collapse to ["?"], so terms queries of any size have the same fingerprint
+
+    :param body: request body, a dict or serialized JSON or NDJSON
+    :return: str
+    """
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            body = [json.loads(line) for line in body.splitlines() if line.strip()]
+    return json.dumps(_strip_literals(body), sort_keys=True, separators=(",", ":"))
+
+
+def get_request_callers():
+    """ Manager method which made the request and the code which called it
+
+    :return: tuple of str, (operation, caller)
+    """
+    operation = caller = None
+    # pylint: disable=protected-access
+    frame = sys._getframe(1)
+    # pylint: enable=protected-access
+    while frame is not None and caller is None:
+        module = frame.f_globals.get("__name__", "")
+        code = frame.f_code
+        if operation is None and module.startswith("es_components.managers"):
+            instance = frame.f_locals.get("self")
+            owner = f"{instance.__class__.__name__}." if instance is not None else ""
+            operation = f"{owner}{code.co_name}"
+        elif not module.startswith(LIBRARY_MODULES):
+            caller = f"{module}:{frame.f_lineno} {code.co_name}"
+        frame = frame.f_back
+    return operation, caller
+
+
+class SlowQuery:
+    """ Statistics of slow requests with the same fingerprint """
+
+    def __init__(self, method, path, fingerprint):
+        self.method = method
+        self.path = path
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total_time = 0
+        self.max_time = 0
+        self.total_took = 0
+        self.hits_total = None
+        self.operation = None
+        self.caller = None
+
+    def add(self, duration, took, hits_total, operation, caller):
+        self.count += 1
+        self.total_time += duration
+        self.total_took += took or 0
+        if duration >= self.max_time:
+            # hits and callers of the slowest request
+            self.max_time = duration
+            self.hits_total = hits_total
+            self.operation = operation
+            self.caller = caller
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "path": self.path,
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_time": self.total_time,
+            "max_time": self.max_time,
+            "avg_took": self.total_took / self.count if self.count else None,
+            "hits_total": self.hits_total,
+            "operation": self.operation,
+            "caller": self.caller,
+        }
+
+
+class SlowQueryLog(TracingHook):
+    """ Tracing hook recording requests slower than threshold by query fingerprint.
+    Keeps up to size fingerprints with the biggest total time
+    """
+
+    def __init__(self, threshold=ES_SLOW_QUERY_THRESHOLD, size=ES_SLOW_QUERY_LOG_SIZE):
+        self.threshold = threshold
+        self.size = size
+        self._queries = {}
+        self._lock = Lock()
+
+    def on_end(self, span):
+        if span.name != "es.request" or span.duration < self.threshold:
+            return
+        method = span.get("method")
+        path = (span.get("url") or "").split("?")[0]
+        fingerprint = fingerprint_query(span.get("query_body"))
+        operation, caller = get_request_callers()
+        key = (method, path, fingerprint)
+
+        with self._lock:
+            query = self._queries.get(key)
+            if query is None:
+                query = self._queries[key] = SlowQuery(method, path, fingerprint)
+            query.add(span.duration, span.get("took"), span.get("hits_total"), operation, caller)
+            if len(self._queries) > self.size:
+                fastest_key = min(self._queries, key=lambda _key: self._queries[_key].total_time)
+                del self._queries[fastest_key]
+
+    def get_top(self, limit=None):
+        """ Slow queries sorted by total time
+
+        :param limit: count of queries to return, all queries by default
+        :return: list of dicts
+        """
+        with self._lock:
+            queries = sorted(self._queries.values(), key=lambda query: query.total_time, reverse=True)
+        return [query.to_dict() for query in queries[:limit]]
+
+    def dump(self, limit=None):
+        """ Slow queries sorted by total time serialized to JSON """
+        return json.dumps(self.get_top(limit), indent=2)
+
+    def clear(self):
+        with self._lock:
+            self._queries.clear()
+
+
+SLOW_QUERY_LOG = SlowQueryLog()
+
+
+def enable_slow_query_log():
+    add_hook(SLOW_QUERY_LOG)
+
+
+def disable_slow_query_log():
+    remove_hook(SLOW_QUERY_LOG)
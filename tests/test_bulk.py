@@ -0,0 +1,168 @@
+import time
+from threading import Lock
+from unittest import TestCase
+from unittest.mock import Mock
+
+from elasticsearch import TransportError
+from elasticsearch.serializer import JSONSerializer
+
+from es_components.bulk import AdaptiveChunkSize
+from es_components.bulk import BULK_ENGINES
+from es_components.bulk import BulkResult
+from es_components.bulk import StreamingBulkEngine
+from es_components.bulk import get_bulk_engine
+from es_components.bulk import get_max_chunk_bytes
+from es_components.config import ES_MAX_CHUNK_BYTES
+from es_components.exceptions import BulkEngineNotSupported
+
+
+class BulkEngineTestCase(TestCase):
+    def _get_client(self):
+        def bulk(body, *args, **kwargs):
+            items = []
+            for line in body.splitlines()[::2]:
+                _id = JSONSerializer().loads(line)["update"]["_id"]
+                status = 400 if _id.startswith("bad") else 200
+                items.append({"update": {"_id": _id, "status": status}})
+            return {"items": items}
+
+        client = Mock()
+        client.transport.serializer = JSONSerializer()
+        client.bulk.side_effect = bulk
+        return client
+
+    def test_collects_failed_items(self):
+        actions = [
+            {"_op_type": "update", "_index": "test", "_id": _id, "doc": {}}
+            for _id in ("good_1", "bad_1", "good_2", "bad_2", "good_3")
+        ]
+        for name in BULK_ENGINES:
+            with self.subTest(name):
+                result = get_bulk_engine(name).execute(self._get_client(), actions, chunk_size=2)
+                self.assertEqual(result.success, 3)
+                self.assertEqual(sorted(error["update"]["_id"] for error in result.errors), ["bad_1", "bad_2"])
+
+    def test_streaming_engine_caps_requests_in_flight(self):
+        in_flight = 0
+        max_in_flight = 0
+        lock = Lock()
+        client = self._get_client()
+        bulk = client.bulk.side_effect
+
+        def slow_bulk(*args, **kwargs):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+            return bulk(*args, **kwargs)
+
+        client.bulk.side_effect = slow_bulk
+        actions = [{"_op_type": "update", "_index": "test", "_id": f"good_{_id}", "doc": {}} for _id in range(50)]
+
+        result = StreamingBulkEngine(max_in_flight=3, queue_size=1).execute(client, actions, chunk_size=2)
+
+        self.assertEqual(result, BulkResult(50, []))
+        self.assertEqual(max_in_flight, 3)
+
+    def test_streaming_engine_raises_request_error(self):
+        client = self._get_client()
+        client.bulk.side_effect = TransportError(500, "error")
+        actions = [{"_op_type": "update", "_index": "test", "_id": f"good_{_id}", "doc": {}} for _id in range(10)]
+
+        with self.assertRaises(TransportError):
+            StreamingBulkEngine(max_in_flight=2).execute(client, actions, chunk_size=2)
+
+    def test_streaming_engine_stops_reading_actions_on_error(self):
+        client = self._get_client()
+        client.bulk.side_effect = TransportError(500, "error")
+        consumed = 0
+        closed = False
+
+        def iter_actions():
+            nonlocal consumed, closed
+            try:
+                for _id in range(2000):
+                    consumed += 1
+                    yield {"_op_type": "update", "_index": "test", "_id": f"good_{_id}", "doc": {}}
+            finally:
+                closed = True
+
+        with self.assertRaises(TransportError):
+            StreamingBulkEngine(max_in_flight=2, queue_size=1).execute(client, iter_actions(), chunk_size=2)
+        time.sleep(0.5)
+
+        self.assertTrue(closed)
+        self.assertLess(consumed, 2000)
+
+    def test_unknown_engine(self):
+        self.assertRaises(BulkEngineNotSupported, get_bulk_engine, "unknown")
+
+    def test_max_chunk_bytes(self):
+        self.assertEqual(get_max_chunk_bytes(http_compress=False, max_wire_bytes=1024), ES_MAX_CHUNK_BYTES)
+        self.assertEqual(get_max_chunk_bytes(http_compress=True, max_wire_bytes=0), ES_MAX_CHUNK_BYTES)
+        self.assertEqual(get_max_chunk_bytes(http_compress=True, max_wire_bytes=1024), 4096)
+        self.assertEqual(get_max_chunk_bytes(http_compress=True, max_wire_bytes=ES_MAX_CHUNK_BYTES),
+                         ES_MAX_CHUNK_BYTES)
+
+
+class AdaptiveChunkSizeTestCase(TestCase):
+    def test_grows_while_latency_is_low(self):
+        adaptive = AdaptiveChunkSize(chunk_size=100, min_chunk_size=10, max_chunk_size=150, target_latency=1)
+        adaptive.record_latency(0.1)
+        self.assertEqual(adaptive.chunk_size, 126)
+        adaptive.record_latency(0.1)
+        self.assertEqual(adaptive.chunk_size, 150)
+        adaptive.record_latency(2)
+        self.assertEqual(adaptive.chunk_size, 150)
+
+    def test_latency_per_request_counts_partial_chunk(self):
+        engine = Mock()
+
+        def execute(client, actions, chunk_size, **params):
+            time.sleep(0.03)
+            return BulkResult(len(actions), [])
+
+        engine.execute.side_effect = execute
+        adaptive = AdaptiveChunkSize(chunk_size=10, min_chunk_size=10, max_chunk_size=100, target_latency=0.025)
+
+        # 19 actions are sent with 2 requests of 0.015 seconds each
+        adaptive.execute(engine, Mock(), [{"_id": str(_id)} for _id in range(19)])
+
+        self.assertEqual(adaptive.chunk_size, 13)
+
+    def test_retries_rejected_items_with_halved_chunk_size(self):
+        chunk_sizes = []
+        engine = Mock()
+
+        def execute(client, actions, chunk_size, **params):
+            chunk_sizes.append(chunk_size)
+            if chunk_size > 25:
+                errors = [{"update": {"_id": action["_id"], "status": 429}} for action in actions[1:]]
+                return BulkResult(1, errors)
+            return BulkResult(len(actions), [])
+
+        engine.execute.side_effect = execute
+        adaptive = AdaptiveChunkSize(chunk_size=100, min_chunk_size=10, max_chunk_size=1000, target_latency=0)
+        actions = [{"_id": str(_id)} for _id in range(5)]
+
+        result = adaptive.execute(engine, Mock(), actions)
+
+        self.assertEqual(result, BulkResult(5, []))
+        self.assertEqual(chunk_sizes, [100, 50, 25])
+        self.assertEqual(adaptive.chunk_size, 25)
+
+    def test_shrinks_on_circuit_breaking_exception(self):
+        engine = Mock()
+        engine.execute.side_effect = [
+            TransportError(429, "circuit_breaking_exception", {}),
+            BulkResult(1, []),
+        ]
+        adaptive = AdaptiveChunkSize(chunk_size=100, min_chunk_size=10, max_chunk_size=1000, target_latency=0)
+
+        result = adaptive.execute(engine, Mock(), [{"_id": "1"}])
+
+        self.assertEqual(result, BulkResult(1, []))
+        self.assertEqual(adaptive.chunk_size, 50)
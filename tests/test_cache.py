@@ -0,0 +1,95 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from es_components.cache import AggregationCache
+from es_components.cache import DocumentCache
+from es_components.cache import LocalSharedCache
+from es_components.cache import LRUCache
+
+
+class LRUCacheTestCase(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.get_stats(), dict(hits=3, misses=1, size=2, max_size=2))
+
+    def test_expires_by_ttl(self):
+        cache = LRUCache(ttl=10)
+        with patch("es_components.cache.time.monotonic", return_value=100):
+            cache.set("a", 1)
+        with patch("es_components.cache.time.monotonic", return_value=109):
+            self.assertEqual(cache.get("a"), 1)
+        with patch("es_components.cache.time.monotonic", return_value=110):
+            self.assertIsNone(cache.get("a"))
+
+
+class DocumentCacheTestCase(TestCase):
+    def test_invalidates_all_sources_of_document(self):
+        cache = DocumentCache()
+        cache.set_document("channels", "1", "main", {"_id": "1"})
+        cache.set_document("channels", "1", "main,stats", {"_id": "1"})
+        cache.set_document("channels", "2", "main", {"_id": "2"})
+
+        cache.invalidate("channels", ["1"])
+
+        self.assertIsNone(cache.get_document("channels", "1", "main"))
+        self.assertIsNone(cache.get_document("channels", "1", "main,stats"))
+        self.assertEqual(cache.get_document("channels", "2", "main"), {"_id": "2"})
+
+    def test_new_source_does_not_extend_expiry(self):
+        cache = DocumentCache(ttl=60)
+        with patch("es_components.cache.time.monotonic", return_value=0):
+            cache.set_document("channels", "1", "main", {"_id": "1"})
+        with patch("es_components.cache.time.monotonic", return_value=50):
+            cache.set_document("channels", "1", "main,stats", {"_id": "1"})
+            self.assertEqual(cache.get_document("channels", "1", "main"), {"_id": "1"})
+        with patch("es_components.cache.time.monotonic", return_value=100):
+            self.assertIsNone(cache.get_document("channels", "1", "main"))
+            self.assertIsNone(cache.get_document("channels", "1", "main,stats"))
+
+    def test_invalidates_namespace(self):
+        cache = DocumentCache()
+        cache.set_document("channels", "1", "main", {"_id": "1"})
+        cache.set_document("videos", "1", "main", {"_id": "1"})
+
+        cache.invalidate_namespace("channels")
+
+        self.assertIsNone(cache.get_document("channels", "1", "main"))
+        self.assertEqual(cache.get_document("videos", "1", "main"), {"_id": "1"})
+
+
+class AggregationCacheTestCase(TestCase):
+    def test_key_does_not_depend_on_dict_order(self):
+        self.assertEqual(AggregationCache.make_key({"a": 1, "b": [1, 2]}, ["x"]),
+                         AggregationCache.make_key({"b": [1, 2], "a": 1}, ["x"]))
+        self.assertNotEqual(AggregationCache.make_key({"a": 1}), AggregationCache.make_key({"a": 2}))
+
+    def test_expires_at_end_of_ttl_window(self):
+        cache = AggregationCache(backend=LocalSharedCache(), ttl=60)
+        with patch("es_components.cache.time.time", return_value=1150):
+            cache.set("key", {"a": 1})
+        with patch("es_components.cache.time.time", return_value=1199):
+            self.assertEqual(cache.get("key"), {"a": 1})
+        with patch("es_components.cache.time.time", return_value=1200):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.get_stats(), dict(hits=1, misses=1))
+
+    def test_zero_ttl_disables_caching(self):
+        cache = AggregationCache(backend=LRUCache(), ttl=0)
+        cache.set("key", {"a": 1})
+
+        self.assertIsNone(cache.get("key"))
+
+    def test_returns_copies(self):
+        cache = AggregationCache(backend=LRUCache())
+        cache.set("key", {"a": {"b": 1}})
+        cache.get("key")["a"]["b"] = 2
+
+        self.assertEqual(cache.get("key"), {"a": {"b": 1}})
@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+from elasticsearch_dsl import Search
+
+from es_components.cache import AggregationCache
+from es_components.cache import LRUCache
+from es_components.constants import Sections
+from es_components.managers.channel import ChannelManager
+from es_components.models.channel import Channel
+from es_components.tests.utils import ESTestCase
+
+
+class ChannelManagerTestCase(ESTestCase):
+    def setUp(self):
+        super().setUp()
+        self.aggregation_cache = AggregationCache(backend=LRUCache(), ttl=60)
+        self.manager = ChannelManager(sections=(Sections.GENERAL_DATA,), aggregation_cache=self.aggregation_cache)
+        channels = []
+        for index, country_code in enumerate(["US", "US", "GB"]):
+            channel = Channel(f"channel_{index}")
+            channel.populate_general_data(country_code=country_code)
+            channels.append(channel)
+        self.manager.upsert(channels)
+
+    def _get_search(self):
+        return self.manager.search(query=self.manager.ids_query(["channel_0", "channel_1", "channel_2"]))
+
+    def test_get_aggregation_cached(self):
+        search = self._get_search()
+        search_query = search.to_dict()
+        properties = ["general_data.country_code"]
+
+        with patch.object(Search, "execute", autospec=True, side_effect=Search.execute) as execute:
+            first = self.manager.get_aggregation(search=search, properties=properties)
+            second = self.manager.get_aggregation(search=search, properties=properties)
+
+        self.assertEqual(execute.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(search.to_dict(), search_query)
+        self.assertEqual(self.aggregation_cache.get_stats(), {"hits": 1, "misses": 1})
+
+    def test_get_aggregation_cache_miss(self):
+        properties = ["general_data.country_code"]
+        other_context_manager = ChannelManager(sections=(Sections.GENERAL_DATA,), context={"key": "value"},
+                                               aggregation_cache=self.aggregation_cache)
+        self.manager.get_aggregation(search=self._get_search(), properties=properties)
+
+        with patch.object(Search, "execute", autospec=True, side_effect=Search.execute) as execute:
+            with self.subTest("Different context"):
+                other_context_manager.get_aggregation(search=self._get_search(), properties=properties)
+                self.assertEqual(execute.call_count, 1)
+
+            with self.subTest("Different properties"):
+                self.manager.get_aggregation(search=self._get_search(),
+                                             properties=properties + ["general_data.iab_categories"])
+                self.assertEqual(execute.call_count, 2)
+
+        self.assertEqual(self.aggregation_cache.get_stats(), {"hits": 0, "misses": 3})
@@ -0,0 +1,37 @@
+import gzip
+from unittest import TestCase
+
+from elasticsearch_dsl import connections
+
+from es_components.connections import CompressedUrllib3HttpConnection
+from es_components.connections import PooledRequestsHttpConnection
+from es_components.connections import reset_es_connections
+
+
+class ConnectionsTestCase(TestCase):
+    def test_reset_recreates_configured_clients(self):
+        # pylint: disable=protected-access
+        connections.configure(**connections.connections._kwargs, test_reset={"hosts": ["localhost"]})
+        # pylint: enable=protected-access
+        self.addCleanup(connections.connections.remove_connection, "test_reset")
+        client = connections.get_connection("test_reset")
+
+        reset_es_connections()
+
+        self.assertIsNot(connections.get_connection("test_reset"), client)
+
+    def test_pooled_requests_connection(self):
+        connection = PooledRequestsHttpConnection(host="localhost", maxsize=25)
+
+        # pylint: disable=protected-access
+        self.assertEqual(connection.session.get_adapter("http://localhost")._pool_maxsize, 25)
+        # pylint: enable=protected-access
+
+    def test_compressed_connection(self):
+        connection = CompressedUrllib3HttpConnection(host="localhost", http_compress=True)
+        body = b'{"query": {"match_all": {}}}' * 100
+
+        # pylint: disable=protected-access
+        self.assertEqual(gzip.decompress(connection._gzip_compress(body)), body)
+        # pylint: enable=protected-access
+        self.assertEqual(connection.headers["accept-encoding"], "gzip,deflate")
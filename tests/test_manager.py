@@ -1,8 +1,23 @@
+import asyncio
 import itertools
+from datetime import timedelta
+from unittest import TestCase
+from unittest import skipIf
+from unittest.mock import Mock
+from unittest.mock import patch
 
 from elasticsearch_dsl import Keyword
 from elasticsearch_dsl import Object
+from elasticsearch_dsl import Search
+from elasticsearch_dsl import connections
 
+from es_components.cache import DocumentCache
+from es_components.cache import get_shared_document_cache
+from es_components.connections import AsyncElasticsearch
+from es_components.connections import close_async_es_connection
+from es_components.datetime_service import datetime_service
+from es_components.exceptions import MultiSearchItemError
+from es_components.managers.async_base import AsyncManagerMixin
 from es_components.managers.base import BaseManager
 from es_components.models.base import BaseDocument
 from es_components.models.base import BaseInnerDoc
@@ -48,6 +63,251 @@ class ESManagerTestCase(ESTestCase):
             updated = manager.get([item.main.id])[0]
             self.assertTrue(item.main.created_at < updated.main.updated_at)
 
+    def test_get_concurrent_chunks_keep_order(self):
+        manager = TestManager()
+        items = [TestDoc(f"id_{next(int_iterator)}") for _ in range(5)]
+        manager.upsert(items)
+        ids = [item.main.id for item in items]
+        ids.insert(2, f"missing_{next(int_iterator)}")
+
+        entities = manager.get(ids, max_workers=3, chunk_size=2)
+
+        self.assertEqual([entity.main.id if entity else None for entity in entities],
+                         [_id if not _id.startswith("missing") else None for _id in ids])
+
+    def test_iter_get(self):
+        manager = TestManager()
+        items = [TestDoc(f"id_{next(int_iterator)}") for _ in range(3)]
+        manager.upsert(items)
+        ids = [item.main.id for item in items] + [f"missing_{next(int_iterator)}"]
+
+        with self.subTest("Yields model objects"):
+            entities = list(manager.iter_get(ids, chunk_size=2))
+            self.assertEqual([entity.main.id for entity in entities[:3]], ids[:3])
+            self.assertIsNone(entities[3])
+
+        with self.subTest("Yields _source dicts"):
+            sources = list(manager.iter_get(ids, chunk_size=2, skip_none=True, raw=True))
+            self.assertEqual([source["main"]["id"] for source in sources], ids[:3])
+
+    def test_get_section_fields(self):
+        self.assertEqual(TestManager.get_section_fields("section_1"), {"dfe", "created_at", "updated_at"})
+        self.assertIs(TestManager.get_section_fields("section_1"), TestManager.get_section_fields("section_1"))
+
+    def test_upsert_lean(self):
+        manager = TestManager(sections=("section_1",))
+
+        with self.subTest("Upserts model objects serializing only upsert sections"):
+            item = TestDoc(f"id_{next(int_iterator)}")
+            item.populate_section("section_1", dfe="value")
+            manager.upsert([item], lean=True)
+            updated = manager.get([item.main.id])[0]
+            self.assertEqual(updated.section_1.dfe, "value")
+            self.assertIsNotNone(updated.section_1.updated_at)
+
+        with self.subTest("Upserts plain dicts keyed by id"):
+            item_id = f"id_{next(int_iterator)}"
+            manager.upsert_dicts({item_id: {"section_1": {"dfe": "value"}}})
+            updated = manager.get([item_id])[0]
+            self.assertEqual(updated.main.id, item_id)
+            self.assertEqual(updated.section_1.dfe, "value")
+
+        with self.subTest("Doesn't modify upserted dicts"):
+            sections_by_id = {f"id_{next(int_iterator)}": {"section_1": {"dfe": "value", "bogus": 1}}}
+            manager.upsert_dicts(sections_by_id)
+            self.assertEqual(list(sections_by_id.values()), [{"section_1": {"dfe": "value", "bogus": 1}}])
+
+        with self.subTest("Adds model bulk action metadata to dicts"):
+            item_id = f"id_{next(int_iterator)}"
+            entry = {"_id": item_id, "_index": manager._get_index_name(), "_source": {"section_1": {"dfe": "value"}}}
+            actions = list(manager._upsert_generator([entry], set()))
+            self.assertEqual(actions[0]["retry_on_conflict"], 3)
+            self.assertEqual(manager.upsert_dicts({item_id: {"section_1": {"dfe": "value"}}}), [])
+
+    def test_batch_session(self):
+        manager = TestManager()
+        items = [TestDoc(f"id_{next(int_iterator)}") for _ in range(3)]
+
+        with manager.batch_session(refresh_interval="-1"):
+            manager.upsert(items)
+            self.assertEqual(manager._get_refresh_interval(), "-1")
+
+        self.assertIsNone(manager._get_refresh_interval())
+        self.assertEqual(manager.search(query=manager.ids_query([item.main.id for item in items])).count(), 3)
+
+    def test_document_cache_invalidated_by_upsert(self):
+        manager = TestManager(sections=("section_1",), document_cache=DocumentCache())
+        item = TestDoc(f"id_{next(int_iterator)}")
+        item.populate_section("section_1", dfe="old")
+        manager.upsert([item])
+
+        self.assertEqual(manager.get([item.main.id])[0].section_1.dfe, "old")
+        self.assertEqual(manager.get([item.main.id])[0].section_1.dfe, "old")
+        self.assertEqual(manager.document_cache.hits, 1)
+
+        item.populate_section("section_1", dfe="new")
+        manager.upsert([item])
+
+        self.assertEqual(manager.get([item.main.id])[0].section_1.dfe, "new")
+
+    def test_shared_document_cache_invalidated_by_other_manager(self):
+        reader = TestManager(sections=("section_1",), document_cache=get_shared_document_cache())
+        writer = TestManager(sections=("section_1",))
+        item = TestDoc(f"id_{next(int_iterator)}")
+        item.populate_section("section_1", dfe="old")
+        writer.upsert([item])
+
+        self.assertEqual(reader.get([item.main.id])[0].section_1.dfe, "old")
+
+        item.populate_section("section_1", dfe="new")
+        writer.upsert([item])
+
+        self.assertEqual(reader.get([item.main.id])[0].section_1.dfe, "new")
+
+        writer.delete([item.main.id])
+
+        self.assertEqual(reader.get([item.main.id]), [None])
+
+    def test_fields_source_filter(self):
+        manager = TestManager(sections=("section_1",))
+        item = TestDoc(f"id_{next(int_iterator)}")
+        item.populate_section("section_1", dfe="value")
+        manager.upsert([item])
+
+        with self.subTest("get includes only given fields"):
+            entity = manager.get([item.main.id], fields=["main.id", "section_1.dfe"])[0]
+            self.assertEqual(entity.section_1.to_dict(), {"dfe": "value"})
+
+        with self.subTest("search excludes given fields"):
+            hit = manager.search(query=manager.ids_query([item.main.id]),
+                                 fields={"excludes": ["section_1.*_at"]}).execute().hits[0]
+            self.assertEqual(hit.section_1.to_dict(), {"dfe": "value"})
+
+    def test_iter_never_updated(self):
+        manager = TestManager(sections=("section_1",), upsert_sections=("main",))
+        items = [TestDoc(f"id_{next(int_iterator)}") for _ in range(5)]
+        manager.upsert(items)
+
+        ids = [item.main.id for item in manager.iter_never_updated(page_size=2)]
+
+        self.assertEqual(sorted(ids), sorted(item.main.id for item in items))
+
+    def test_iter_outdated(self):
+        manager = TestManager(sections=("section_1",))
+        items = [TestDoc(f"id_{next(int_iterator)}") for _ in range(5)]
+        for item in items:
+            item.populate_section("section_1", dfe="value")
+        manager.upsert(items)
+        outdated_at = datetime_service.now() + timedelta(days=1)
+
+        with patch.object(Search, "execute", autospec=True, side_effect=Search.execute) as execute:
+            ids = [item.main.id for item in manager.iter_outdated(outdated_at, get_tracked=False, page_size=2)]
+
+        self.assertEqual(sorted(ids), sorted(item.main.id for item in items))
+        self.assertEqual(execute.call_count, 3)
+
+    def test_iter_ids(self):
+        manager = TestManager()
+        items = [TestDoc(f"id_{next(int_iterator)}") for _ in range(5)]
+        manager.upsert(items)
+        query = manager.ids_query([item.main.id for item in items[:3]])
+
+        with self.subTest("Single scroll"):
+            self.assertEqual(sorted(manager.iter_ids(query=query, page_size=2)),
+                             sorted(item.main.id for item in items[:3]))
+
+        with self.subTest("Sliced scroll"):
+            self.assertEqual(sorted(manager.iter_ids(query=query, page_size=2, sliced=True, slices=2)),
+                             sorted(item.main.id for item in items[:3]))
+
+    def test_fetch_all_percentiles(self):
+        manager = TestManager()
+        manager.upsert([TestDoc(f"id_{next(int_iterator)}") for _ in range(3)])
+
+        percentiles = TestManager.fetch_all_percentiles(["main.created_at", "main.updated_at"], percents=(50,))
+
+        self.assertEqual(set(percentiles), {"main.created_at", "main.updated_at"})
+        self.assertEqual(list(percentiles["main.created_at"]), ["50.0"])
+        self.assertIsNotNone(percentiles["main.created_at"]["50.0"])
+
+    def test_batch_search(self):
+        manager = TestManager()
+        items = [TestDoc(f"id_{next(int_iterator)}") for _ in range(3)]
+        manager.upsert(items)
+        searches = [manager.search(query=manager.ids_query([item.main.id for item in items[:count]]))
+                    for count in (3, 1, 2)]
+        failing_search = manager.search(query={"range": {"main.id": {"gt": "a", "format": "invalid"}}})
+
+        with self.subTest("Responses keep the order of searches"):
+            responses = manager.batch_search(searches, batch_size=2, max_workers=2)
+            self.assertEqual([response.hits.total.value for response in responses], [3, 1, 2])
+
+        with self.subTest("Failed searches are returned as errors"):
+            responses = manager.batch_search([searches[0], failing_search], raise_on_error=False)
+            self.assertEqual(responses[0].hits.total.value, 3)
+            self.assertIsInstance(responses[1], MultiSearchItemError)
+
+    @skipIf(AsyncElasticsearch is None, "aiohttp is not installed")
+    def test_async_manager(self):
+        manager = AsyncTestManager(sections=("section_1",))
+        item = TestDoc(f"id_{next(int_iterator)}")
+        item.populate_section("section_1", dfe="value")
+
+        async def run():
+            try:
+                await manager.aupsert([item])
+                entities = await manager.aget([item.main.id, f"missing_{next(int_iterator)}"])
+                response = await manager.asearch(query=manager.ids_query([item.main.id]))
+                await manager.adelete([item.main.id], conflicts="proceed")
+                return entities, response
+            finally:
+                await close_async_es_connection()
+
+        entities, response = asyncio.run(run())
+
+        self.assertEqual(entities[0].section_1.dfe, "value")
+        self.assertIsNone(entities[1])
+        self.assertEqual(response.hits.total.value, 1)
+        self.assertEqual(manager.get([item.main.id]), [None])
+
+
+class SearchAfterPointInTimeTestCase(TestCase):
+    def setUp(self):
+        self.connection = Mock()
+        self.connection.open_point_in_time.return_value = {"id": "pit_1"}
+        self.connection.search.side_effect = [self._get_page("pit_2", 1, 2), self._get_page("pit_3", 3, 4)]
+        # pylint: disable=protected-access
+        patcher = patch.dict(connections.connections._conns, {"default": self.connection})
+        # pylint: enable=protected-access
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _get_page(pit_id, *numbers):
+        hits = [
+            {"_index": "test_documents_1", "_id": f"id_{number}", "_source": {"main": {"id": f"id_{number}"}},
+             "sort": [number, f"id_{number}"]}
+            for number in numbers
+        ]
+        return {"pit_id": pit_id, "hits": {"total": {"value": 4}, "hits": hits}}
+
+    def test_point_in_time_closed_on_early_exit(self):
+        manager = TestManager()
+        search = manager.search(sort=["section_1.updated_at", "main.id"])
+
+        hits = manager.iter_search_after(search, page_size=2, point_in_time=True)
+        ids = [next(hits).main.id for _ in range(3)]
+        hits.close()
+
+        self.assertEqual(ids, ["id_1", "id_2", "id_3"])
+        self.connection.open_point_in_time.assert_called_once_with(index=manager._get_index_name(), keep_alive="5m")
+        first_request, second_request = self.connection.search.call_args_list
+        self.assertIsNone(first_request[1]["index"])
+        self.assertEqual(first_request[1]["body"]["pit"], {"id": "pit_1", "keep_alive": "5m"})
+        self.assertEqual(second_request[1]["body"]["pit"], {"id": "pit_2", "keep_alive": "5m"})
+        self.assertEqual(second_request[1]["body"]["search_after"], [2, "id_2"])
+        self.connection.close_point_in_time.assert_called_once_with(body={"id": "pit_3"})
+
 
 class TestSection1(BaseInnerDoc):
     dfe = Keyword()
@@ -59,6 +319,10 @@ class TestDoc(BaseDocument):
     def populate_section(self, *args, **kwargs):
         return self._populate_section(*args, **kwargs)
 
+    @classmethod
+    def get_bulk_action_meta(cls):
+        return {"retry_on_conflict": 3}
+
     class Index:
         name = "test_documents"
         prefix = "test_documents_"
@@ -70,3 +334,7 @@ class TestDoc(BaseDocument):
 class TestManager(BaseManager):
     allowed_sections = BaseManager.allowed_sections + ("section_1",)
     model = TestDoc
+
+
+class AsyncTestManager(AsyncManagerMixin, TestManager):
+    pass
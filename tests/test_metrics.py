@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+from es_components.metrics import Counter
+from es_components.metrics import Histogram
+from es_components.metrics import MetricsRegistry
+from es_components.metrics import OPERATION_DOCUMENTS
+from es_components.metrics import OPERATION_DURATION
+from es_components.metrics import OPERATION_ERRORS
+from es_components.metrics import instrument
+
+
+class MetricsRegistryTestCase(TestCase):
+    def test_render_text_format(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Count of requests", ("index",))
+        histogram = registry.histogram("duration_seconds", "Duration", buckets=(0.1, 1))
+        counter.inc(index="chan\"nels")
+        counter.inc(2, index="chan\"nels")
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        self.assertEqual(registry.render(), "\n".join([
+            "# HELP requests_total Count of requests",
+            "# TYPE requests_total counter",
+            "requests_total{index=\"chan\\\"nels\"} 3.0",
+            "# HELP duration_seconds Duration",
+            "# TYPE duration_seconds histogram",
+            "duration_seconds_bucket{le=\"0.1\"} 0",
+            "duration_seconds_bucket{le=\"1.0\"} 1",
+            "duration_seconds_bucket{le=\"+Inf\"} 2",
+            "duration_seconds_sum 5.5",
+            "duration_seconds_count 2",
+        ]) + "\n")
+
+    def test_counter_by_labels(self):
+        counter = Counter("total", "Total", ("operation",))
+        counter.inc(operation="get")
+
+        self.assertEqual(counter.get(operation="get"), 1)
+        self.assertEqual(counter.get(operation="upsert"), 0)
+
+    def test_histogram_count(self):
+        histogram = Histogram("duration", "Duration")
+        histogram.observe(0.2)
+        histogram.observe(100)
+
+        self.assertEqual(histogram.get_count(), 2)
+
+
+class InstrumentTestCase(TestCase):
+    def test_instrument_methods(self):
+        manager = TestMetricsManager()
+        labels = dict(manager="TestMetricsManager", index="test_metrics")
+
+        manager.get([1, 2])
+        self.assertEqual(list(manager.iter_ids([1, 2, 3])), [1, 2, 3])
+        with self.assertRaises(ValueError):
+            manager.fail()
+
+        self.assertEqual(OPERATION_DOCUMENTS.get(operation="get", **labels), 2)
+        self.assertEqual(OPERATION_DOCUMENTS.get(operation="iter_ids", **labels), 3)
+        self.assertEqual(OPERATION_DURATION.get_count(operation="iter_ids", **labels), 1)
+        self.assertEqual(OPERATION_ERRORS.get(operation="fail", **labels), 1)
+
+
+class TestMetricsManager:
+    @staticmethod
+    def _get_index_name():
+        return "test_metrics"
+
+    @instrument("get", documents=len)
+    def get(self, ids):
+        return list(ids)
+
+    @instrument("iter_ids")
+    def iter_ids(self, ids):
+        yield from ids
+
+    @instrument("fail")
+    def fail(self):
+        raise ValueError
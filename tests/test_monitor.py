@@ -0,0 +1,124 @@
+import json
+from datetime import timedelta
+from unittest import TestCase
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from elasticsearch.helpers import bulk
+from elasticsearch_dsl import connections
+
+from es_components.datetime_service import datetime_service
+from es_components.managers.channel import ChannelManager
+from es_components.models.channel import Channel
+from es_components.monitor import MonitoringPerformance
+from es_components.monitor import Warnings
+from es_components.tests.utils import ESTestCase
+
+
+def days_ago(days):
+    return (datetime_service.now() - timedelta(days=days, hours=1)).isoformat()
+
+
+class MonitoringPerformanceTestCase(ESTestCase):
+    def setUp(self):
+        super().setUp()
+        # pylint: disable=protected-access
+        self.index_name = Channel._index._name
+        # pylint: enable=protected-access
+        sources = {
+            "updated": {
+                "stats": {"created_at": days_ago(2), "updated_at": days_ago(2)},
+            },
+            "skipped": {
+                "stats": {"created_at": days_ago(10), "updated_at": days_ago(10)},
+                "stats_schedule": {"created_at": days_ago(2), "updated_at": days_ago(0)},
+            },
+            "deleted": {
+                "deleted": {"reason": "test", "created_at": days_ago(0)},
+            },
+            "empty": {},
+        }
+        bulk(connections.get_connection(), [
+            {"_index": self.index_name, "_id": _id, "_source": {"main": {"id": _id}, **source}}
+            for _id, source in sources.items()
+        ], refresh="true")
+
+    def test_get_info(self):
+        by_days = {"last_day": 0, "last_3_days": 1, "last_7_days": 1, "last_30_days": 2, "last_365_days": 2}
+
+        info = MonitoringPerformance(self.index_name).get_info(("stats",), ("stats",))
+
+        self.assertEqual(info, {
+            "info_by_sections": {
+                "stats": {"filled": 2, "missed": 2, "updated_by_days": by_days, "created_by_days": by_days},
+            },
+            "general": {"deleted": 1, "skipped": 1},
+        })
+
+    def test_get_info_ignore_deleted(self):
+        info = MonitoringPerformance(self.index_name).get_info(("stats",), ("stats",), True)
+
+        self.assertEqual(info["info_by_sections"]["stats"]["filled"], 2)
+        self.assertEqual(info["info_by_sections"]["stats"]["missed"], 1)
+        self.assertEqual(info["general"]["deleted"], 1)
+
+    def test_get_info_without_skipped_sections(self):
+        info = MonitoringPerformance(self.index_name).get_info(("stats",), ())
+
+        self.assertEqual(info["general"], {"deleted": 1, "skipped": None})
+
+
+class MonitoringSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.connection = Mock()
+        self.connection.count.return_value = {"count": 10}
+        self.connection.search.side_effect = self._search
+        self.connection.cluster.stats.return_value = {"cluster_name": "account:test"}
+        self.connection.cat.indices.return_value = []
+        patcher = patch.object(connections, "get_connection", return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _search(index, body):
+        filters = body["aggs"]["counts"]["filters"]["filters"]
+        return {"aggregations": {"counts": {"buckets": {name: {"doc_count": 1} for name in filters}}}}
+
+    def _get_counted_bodies(self):
+        return [
+            json.dumps(call[1]["body"], sort_keys=True, default=lambda query: query.to_dict())
+            for call in self.connection.count.call_args_list
+        ]
+
+    def test_counts_memoized_within_snapshot(self):
+        monitor = MonitoringPerformance("channels")
+        warnings = [
+            Warnings.FewRecordsUpdated("stats", 50),
+            Warnings.FewRecordsUpdated("stats", 60),
+            Warnings.MainSectionNotFilled(),
+        ]
+
+        with monitor.snapshot():
+            monitor.get_warnings(warnings)
+            monitor.get_warnings(warnings)
+
+        self.assertEqual(self.connection.count.call_count, 4)
+
+        self.connection.count.return_value = {"count": 20}
+        monitor.get_warnings(warnings)
+
+        self.assertEqual(self.connection.count.call_count, 10)
+
+    def test_get_monitoring_data_requests_every_count_once(self):
+        manager = ChannelManager()
+
+        manager.get_monitoring_data()
+
+        counted_bodies = self._get_counted_bodies()
+        self.assertEqual(len(counted_bodies), len(set(counted_bodies)))
+        self.assertEqual(self.connection.search.call_count, 1)
+
+        manager.get_monitoring_data()
+
+        self.assertEqual(self.connection.count.call_count, 2 * len(counted_bodies))
+        self.assertEqual(self.connection.search.call_count, 2)
@@ -0,0 +1,58 @@
+import json
+from unittest import TestCase
+
+from es_components.slow_query_log import SlowQueryLog
+from es_components.slow_query_log import fingerprint_query
+from es_components.tracing import Span
+
+
+def make_request_span(body, duration, url="/channels/_search", took=900, hits_total=5):
+    span = Span("es.request", method="POST", url=url, query_body=json.dumps(body), took=took, hits_total=hits_total)
+    span.duration = duration
+    return span
+
+
+class FingerprintTestCase(TestCase):
+    def test_literals_stripped(self):
+        first = {"query": {"terms": {"main.id": ["a", "b", "c"]}}, "size": 10}
+        second = {"size": 1000, "query": {"terms": {"main.id": ["d"]}}}
+
+        self.assertEqual(fingerprint_query(first), fingerprint_query(json.dumps(second)))
+        self.assertEqual(fingerprint_query(first), '{"query":{"terms":{"main.id":["?"]}},"size":"?"}')
+
+    def test_different_fields(self):
+        self.assertNotEqual(
+            fingerprint_query({"query": {"term": {"general_data.title": "a"}}}),
+            fingerprint_query({"query": {"term": {"general_data.description": "a"}}}),
+        )
+
+    def test_ndjson(self):
+        body = "{\"index\": \"channels\"}\n{\"query\": {\"match_all\": {}}}\n"
+
+        self.assertEqual(fingerprint_query(body), '[{"index":"?"},{"query":{"match_all":{}}}]')
+
+
+class SlowQueryLogTestCase(TestCase):
+    def test_top_by_total_time(self):
+        slow_query_log = SlowQueryLog(threshold=1, size=2)
+        terms_query = {"query": {"terms": {"main.id": ["a"]}}}
+        aggregation = {"aggs": {"categories": {"terms": {"field": "general_data.iab_categories"}}}}
+        exists_query = {"query": {"exists": {"field": "stats"}}}
+
+        slow_query_log.on_end(make_request_span(terms_query, 2))
+        slow_query_log.on_end(make_request_span({"query": {"terms": {"main.id": ["b", "c"]}}}, 3))
+        slow_query_log.on_end(make_request_span(aggregation, 4))
+        slow_query_log.on_end(make_request_span(exists_query, 0.5))
+        slow_query_log.on_end(make_request_span(exists_query, 1.5))
+
+        top = slow_query_log.get_top()
+        self.assertEqual([query["fingerprint"] for query in top],
+                         [fingerprint_query(terms_query), fingerprint_query(aggregation)])
+        self.assertEqual(top[0]["count"], 2)
+        self.assertEqual(top[0]["total_time"], 5)
+        self.assertEqual(top[0]["max_time"], 3)
+        self.assertEqual(top[0]["avg_took"], 900)
+        self.assertEqual(top[0]["hits_total"], 5)
+        self.assertEqual(top[0]["operation"], None)
+        self.assertIsNotNone(top[0]["caller"])
+        self.assertEqual(json.loads(slow_query_log.dump(limit=1)), top[:1])
@@ -0,0 +1,94 @@
+import json
+from unittest import TestCase
+
+from elasticsearch import Connection
+
+from es_components.tracing import NOOP_SPAN
+from es_components.tracing import TracingHook
+from es_components.tracing import TracingTransport
+from es_components.tracing import add_hook
+from es_components.tracing import remove_hook
+from es_components.tracing import span
+from es_components.tracing import timed_iter
+
+
+class RecordingHook(TracingHook):
+    def __init__(self):
+        self.started = []
+        self.ended = []
+
+    def on_start(self, span):
+        self.started.append(span)
+
+    def on_end(self, span):
+        self.ended.append(span)
+
+
+class SearchResponseConnection(Connection):
+    def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+        return 200, {}, json.dumps({"took": 7, "hits": {"hits": [{"_id": "1"}, {"_id": "2"}]}})
+
+
+class TracingTestCase(TestCase):
+    def setUp(self):
+        self.hook = RecordingHook()
+        add_hook(self.hook)
+        self.addCleanup(remove_hook, self.hook)
+
+    def test_nested_spans(self):
+        with span("outer", index="test") as outer:
+            with span("inner") as inner:
+                pass
+
+        self.assertEqual(self.hook.started, [outer, inner])
+        self.assertEqual(self.hook.ended, [inner, outer])
+        self.assertIs(inner.parent, outer)
+        self.assertEqual(outer.get("index"), "test")
+        self.assertGreaterEqual(outer.duration, inner.duration)
+
+    def test_span_error(self):
+        with self.assertRaises(ValueError):
+            with span("failed"):
+                raise ValueError
+
+        self.assertIsInstance(self.hook.ended[0].error, ValueError)
+
+    def test_noop_span_without_hooks(self):
+        remove_hook(self.hook)
+
+        with span("outer") as outer:
+            self.assertEqual(list(timed_iter([1, 2], outer, "time")), [1, 2])
+
+        self.assertIs(outer, NOOP_SPAN)
+        self.assertEqual(self.hook.started, [])
+
+    def test_timed_iter(self):
+        with span("serialization") as _span:
+            self.assertEqual(list(timed_iter(iter([1, 2]), _span, "serialization_time")), [1, 2])
+
+        self.assertGreater(_span.get("serialization_time"), 0)
+
+    def test_transport_request_span(self):
+        transport = TracingTransport([{}], connection_class=SearchResponseConnection)
+        body = {"query": {"match_all": {}}}
+
+        result = transport.perform_request("POST", "/test/_search", body=body)
+
+        request_span = self.hook.ended[0]
+        self.assertEqual(len(result["hits"]["hits"]), 2)
+        self.assertEqual(request_span.name, "es.request")
+        self.assertEqual(request_span.get("url"), "/test/_search")
+        self.assertEqual(request_span.get("body_size"), len(json.dumps(body, separators=(",", ":"))))
+        self.assertEqual(request_span.get("took"), 7)
+        self.assertEqual(request_span.get("result_size"), 2)
+        self.assertIsNotNone(request_span.get("serialization_time"))
+        self.assertEqual(json.loads(request_span.get("query_body")), body)
+
+    def test_transport_bulk_body_not_kept(self):
+        transport = TracingTransport([{}], connection_class=SearchResponseConnection)
+
+        transport.perform_request("POST", "/_bulk", body="{\"index\": {}}\n{\"a\": 1}\n")
+
+        request_span = self.hook.ended[0]
+        self.assertGreater(request_span.get("body_size"), 0)
+        self.assertIsNone(request_span.get("query_body"))
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from es_components.utils import concurrent_map
+from es_components.utils import merge_iterators
+
+
+class ConcurrentMapTestCase(TestCase):
+    def test_keeps_order(self):
+        self.assertEqual(concurrent_map(lambda value: value * 2, range(10), max_workers=4), list(range(0, 20, 2)))
+
+
+class MergeIteratorsTestCase(TestCase):
+    def test_yields_items_of_all_iterables(self):
+        iterables = [range(0, 100), range(100, 150), range(150, 300)]
+
+        items = list(merge_iterators(iterables, max_workers=2, queue_size=10))
+
+        self.assertEqual(sorted(items), list(range(300)))
+
+    def test_reraises_error(self):
+        def failing():
+            yield 1
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            list(merge_iterators([range(10), failing()]))
+
+    def test_closes_iterables_on_early_exit(self):
+        closed = []
+
+        def generator():
+            try:
+                yield from range(1000)
+            finally:
+                closed.append(True)
+
+        merged = merge_iterators([generator(), generator()], queue_size=1)
+        next(merged)
+        merged.close()
+
+        self.assertEqual(closed, [True, True])
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from es_components.constants import Sections
+from es_components.datetime_service import datetime_service
+from es_components.managers.base import COUNT_EXISTS_AGGREGATION
+from es_components.managers.video import VideoManager
+from es_components.models.video import Video
+from es_components.tests.utils import ESTestCase
+
+
+class VideoManagerTestCase(ESTestCase):
+    def test_get_totals_by_channel_ids(self):
+        manager = VideoManager(sections=(Sections.CHANNEL,))
+        videos_count_by_channel = {"channel_1": 3, "channel_2": 1, "channel_3": 2, "channel_4": 1, "channel_5": 2}
+        videos = []
+        for channel_id, videos_count in videos_count_by_channel.items():
+            for index in range(videos_count):
+                video = Video(f"video_{channel_id}_{index}")
+                video.populate_channel(id=channel_id)
+                videos.append(video)
+        manager.upsert(videos)
+        channel_ids = ["channel_5", "missing_1", "channel_1", "channel_2", "channel_5", "channel_3", "missing_2",
+                       "channel_4"]
+
+        # chunks of 3 unique ids are paged by 2 buckets
+        with patch("es_components.managers.video.TOTALS_COMPOSITE_PAGE_SIZE", 2):
+            totals = manager.get_totals_by_channel_ids(channel_ids, chunk_size=3, max_workers=2)
+
+        self.assertEqual(list(totals.items()), [
+            ("channel_5", 2),
+            ("missing_1", 0),
+            ("channel_1", 3),
+            ("channel_2", 1),
+            ("channel_3", 2),
+            ("missing_2", 0),
+            ("channel_4", 1),
+        ])
+
+    def test_get_aggregation_count_exists(self):
+        manager = VideoManager(sections=(Sections.TASK_US_DATA,))
+        vetted = Video("video_vetted")
+        vetted.populate_task_us_data(age_group="1", last_vetted_at=datetime_service.now())
+        not_vetted = Video("video_not_vetted")
+        not_vetted.populate_task_us_data(age_group="1")
+        empty = Video("video_empty")
+        not_searched = Video("video_not_searched")
+        not_searched.populate_task_us_data(age_group="1", last_vetted_at=datetime_service.now())
+        manager.upsert([vetted, not_vetted, empty, not_searched])
+        search = manager.search(query=manager.ids_query(["video_vetted", "video_not_vetted", "video_empty"]))
+        properties = ["task_us_data:exists", "task_us_data:missing",
+                      "task_us_data.last_vetted_at:exists", "task_us_data.last_vetted_at:missing"]
+
+        result = manager.get_aggregation(search=search, properties=properties)
+
+        self.assertEqual({key: result[key] for key in properties}, {
+            "task_us_data:exists": 2,
+            "task_us_data:missing": 1,
+            "task_us_data.last_vetted_at:exists": 1,
+            "task_us_data.last_vetted_at:missing": 2,
+        })
+        self.assertNotIn(COUNT_EXISTS_AGGREGATION, result)
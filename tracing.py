@@ -0,0 +1,189 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from elasticsearch import Transport
+
+BULK_PATH = "_bulk"
+
+_hooks = ()
+_hooks_lock = Lock()
+_current_span = ContextVar("es_components_current_span", default=None)
+
+
+class TracingHook:
+    """ Base class of tracing hooks. Hooks are called synchronously in the thread making the request,
+    so they should be cheap and must not raise
+    """
+
+    def on_start(self, span):
+        """ Called before the traced code is executed """
+
+    def on_end(self, span):
+        """ Called after the traced code is executed, span.duration and span.error are set """
+
+
+class Span:
+    """ Traced block of code. Attributes of Elasticsearch requests ("es.request" spans):
+    method, url, body_size (bytes), serialization_time (seconds), took (ms reported by ES), result_size, hits_total
+    and query_body, the serialized body of requests other than bulk ones
+    """
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.started_at = None
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, name, value):
+        """ Increment a numeric attribute """
+        self.attributes[name] = self.attributes.get(name, 0) + value
+
+    def get(self, name, default=None):
+        return self.attributes.get(name, default)
+
+    def __repr__(self):
+        return f"<Span {self.name} duration={self.duration} {self.attributes}>"
+
+
+class _NoopSpan(Span):
+    """ Span used when no hooks are registered, it doesn't store attributes """
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, name, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan("noop")
+
+
+def add_hook(hook):
+    """ Register a TracingHook called around every traced block """
+    # pylint: disable=global-statement
+    global _hooks
+    # pylint: enable=global-statement
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    # pylint: disable=global-statement
+    global _hooks
+    # pylint: enable=global-statement
+    with _hooks_lock:
+        _hooks = tuple(_hook for _hook in _hooks if _hook is not hook)
+
+
+def is_tracing_enabled():
+    return bool(_hooks)
+
+
+def get_current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """ Trace the block of code, e.g.
+
+        with span("manager.upsert", index=index_name) as upsert_span:
+            upsert_span.set(documents=len(entries))
+
+    Spans opened inside the block in the same thread or task get it as the parent span.
+    If no hooks are registered NOOP_SPAN is yielded and nothing is measured
+    """
+    hooks = _hooks
+    if not hooks:
+        yield NOOP_SPAN
+        return
+
+    _span = Span(name, parent=_current_span.get(), **attributes)
+    token = _current_span.set(_span)
+    for hook in hooks:
+        hook.on_start(_span)
+    _span.started_at = time.perf_counter()
+    try:
+        yield _span
+    except BaseException as e:
+        _span.error = e
+        raise
+    finally:
+        _span.duration = time.perf_counter() - _span.started_at
+        _current_span.reset(token)
+        for hook in hooks:
+            hook.on_end(_span)
+
+
+def timed_iter(iterable, _span, attribute):
+    """ Yield items of the iterable adding time spent to produce them to the span attribute """
+    if _span is NOOP_SPAN:
+        yield from iterable
+        return
+
+    iterator = iter(iterable)
+    while True:
+        started_at = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _span.add(attribute, time.perf_counter() - started_at)
+        yield item
+
+
+def get_hits_total(result):
+    """ Total count of hits matched by the search request """
+    if not isinstance(result, dict) or "hits" not in result:
+        return None
+    total = result["hits"].get("total")
+    return total.get("value") if isinstance(total, dict) else total
+
+
+def get_result_size(result):
+    """ Count of hits, documents or items in the Elasticsearch response """
+    if not isinstance(result, dict):
+        return None
+    if "hits" in result:
+        return len(result["hits"].get("hits", []))
+    for key in ("docs", "items", "responses"):
+        if key in result:
+            return len(result[key])
+    return None
+
+
+class TracingTransport(Transport):
+    """ Transport tracing every request with an "es.request" span """
+
+    # pylint: disable=too-many-arguments
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        if not _hooks:
+            return super().perform_request(method, url, headers=headers, params=params, body=body)
+
+        with span("es.request", method=method, url=url) as request_span:
+            started_at = time.perf_counter()
+            if body is not None:
+                body = self.serializer.dumps(body)
+            request_span.set(
+                serialization_time=time.perf_counter() - started_at,
+                body_size=len(body.encode("utf-8") if isinstance(body, str) else body) if body is not None else 0,
+            )
+            if body is not None and not url.endswith(BULK_PATH):
+                # bulk bodies are documents rather than queries and may take tens of megabytes
+                request_span.set(query_body=body)
+            result = super().perform_request(method, url, headers=headers, params=params, body=body)
+            if isinstance(result, dict):
+                request_span.set(
+                    took=result.get("took"), result_size=get_result_size(result), hits_total=get_hits_total(result)
+                )
+            return result
+    # pylint: enable=too-many-arguments
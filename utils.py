@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from itertools import count
 from itertools import groupby
+from queue import Full
+from queue import Queue
+from threading import Event
 import time
 
 from elasticsearch.exceptions import ConflictError
@@ -11,6 +15,75 @@ def chunks(iterable, size):
         yield group
 
 
+def concurrent_map(func, iterable, max_workers=1):
+    """
+    Apply func to every item of iterable using up to max_workers threads.
+    Results are returned in the order of items
+    """
+    if max_workers is None or max_workers <= 1:
+        return [func(item) for item in iterable]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, iterable))
+
+
+def merge_iterators(iterables, max_workers=None, queue_size=1000):
+    """
+    Consume iterables in a pool of threads and yield their items through one iterator.
+    Items of different iterables are interleaved, at most queue_size items are buffered.
+    An exception raised by any iterable is re-raised by the merged iterator.
+    """
+    iterables = list(iterables)
+    if not iterables:
+        return
+    items = Queue(maxsize=queue_size)
+    stop = Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def consume(iterable):
+        iterator = iter(iterable)
+        try:
+            if stop.is_set():
+                return
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        # pylint: disable=broad-except
+        except Exception as error:
+            put((done, error))
+        # pylint: enable=broad-except
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(iterables)) as executor:
+        for iterable in iterables:
+            executor.submit(consume, iterable)
+
+        finished = 0
+        try:
+            while finished < len(iterables):
+                item, error = items.get()
+                if item is done:
+                    if error is not None:
+                        raise error
+                    finished += 1
+                    continue
+                yield item
+        finally:
+            stop.set()
+
+
 def safe_div(numerator, denominator):
     try:
         return numerator / denominator